@@ -1,171 +1,629 @@
 from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import SGDClassifier
 from sklearn.preprocessing import label_binarize
+from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import Pipeline
+from sklearn.exceptions import ConvergenceWarning
 import numpy as np
+import copy
+import warnings
+import os
+import shutil
+import tempfile
 from sklearn.metrics import roc_auc_score
+from sklearn.metrics import log_loss
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+from sklearn.model_selection import StratifiedKFold
+from joblib import Parallel, delayed
+import joblib
+from file_ops.file_methods import File_Operation
+import time
+
+# the gradient solvers converge slowly on features of different scales, they are given standardized features
+scaled_solvers = ['sag', 'saga']
+# the lbfgs solver of scikit-learn fits on float64 only, it copies float32 features to float64.
+# The other solvers and the StandardScaler keep float32
+float64_solvers = ['lbfgs']
+
+
+def makeModel(params):
+   """
+     Method Name: makeModel
+     Description:This function makes the untrained logistic regression of the parameters. The
+                 solvers of scaled_solvers get a standardization step in front of the model, the
+                 scaler is fitted and saved together with the model
+     Input: params(parameters of LogisticRegression)
+     Output: LogisticRegression, or Pipeline of StandardScaler and LogisticRegression
+     Written By: Anupam Hore
+     Version: 1.0
+     Revisions: None
+   """
+   log_reg = LogisticRegression(multi_class='ovr', **params)
+   if log_reg.solver in scaled_solvers:
+      return Pipeline([('scaler', StandardScaler()), ('model', log_reg)])
+   return log_reg
+
+
+def finalModel(estimator):
+   """
+     Method Name: finalModel
+     Description:This function gives the logistic regression of a model made by makeModel
+     Input: estimator
+     Output: the last step of a Pipeline, the estimator itself otherwise
+     Written By: Anupam Hore
+     Version: 1.0
+     Revisions: None
+   """
+   return estimator.steps[-1][1] if isinstance(estimator, Pipeline) else estimator
+
+
+def fitModel(estimator, X_train, y_train):
+   """
+     Method Name: fitModel
+     Description:This function trains the model and records the fit. The convergence warnings of
+                 the solver are caught and recorded instead of being printed, the other warnings
+                 are given again. The loss is the log loss of the training data. The dtype is the
+                 one the solver fits on, upcast tells that the solver copied the float32 features
+                 to float64 (float64_solvers)
+     Input: estimator, X_train, y_train
+     Output: Dictionary of the solver, rows, fit time, iterations, convergence, loss, dtype and upcast
+     Written By: Anupam Hore
+     Version: 1.1
+     Revisions: Records the dtype of the fit
+   """
+   start = time.perf_counter()
+   with warnings.catch_warnings(record=True) as caught:
+      warnings.simplefilter('always', ConvergenceWarning)
+      estimator.fit(X_train, y_train)
+   fit_time = time.perf_counter() - start
+
+   converged = True
+   for warning in caught:
+      if issubclass(warning.category, ConvergenceWarning):
+         converged = False
+      else:
+         warnings.warn_explicit(warning.message, warning.category, warning.filename, warning.lineno)
+
+   model = finalModel(estimator)
+   n_iter = getattr(model, 'n_iter_', None)
+   dtypes = getattr(X_train, 'dtypes', None)
+   dtype = np.result_type(*dtypes) if dtypes is not None else np.asarray(X_train).dtype
+   upcast = getattr(model, 'solver', None) in float64_solvers and dtype == np.float32
+   return {"solver": getattr(model, 'solver', type(model).__name__),
+           "rows": len(y_train),
+           "fit_time": fit_time,
+           "n_iter": int(np.max(n_iter)) if n_iter is not None else None,
+           "converged": converged,
+           "loss": float(log_loss(y_train, estimator.predict_proba(X_train), labels=estimator.classes_)),
+           "dtype": 'float64' if upcast else str(dtype),
+           "upcast": bool(upcast)}
+
+
+def modelScore(model, X, Y, labels):
+   """
+     Method Name: modelScore
+     Description:This function calculates the macro one vs rest roc auc of the predicted labels.
+                 The classes which are not in Y are left out of the average, so a small test set
+                 which misses an activity can still be scored
+     Input: model, X, Y, labels(all the classes of the target)
+     Output: score of the model
+     Written By: Anupam Hore
+     Version: 1.0
+     Revisions: None
+   """
+   y_pred = label_binarize(model.predict(X), classes=labels)
+   y_true = label_binarize(np.asarray(Y), classes=labels)
+   present = y_true.any(axis=0)
+   return roc_auc_score(y_true[:, present], y_pred[:, present], average='macro')
+
+
+def fitAndScore(modelName, estimator, X_train, y_train, X_test, y_test, labels):
+   """
+     Method Name: fitAndScore
+     Description:This function trains one candidate model and scores it with the test data. It runs
+                 in the workers of get_best_model, the training arrays are shared read only
+     Input: modelName, estimator(the untrained model), X_train, y_train, X_test, y_test, labels
+     Output: Dictionary of the model name, score, trained model and the record of fitModel
+     Written By: Anupam Hore
+     Version: 1.1
+     Revisions: Records the convergence and the loss of the fit
+   """
+   result = fitModel(estimator, X_train, y_train)
+   result.update({"modelName": modelName,
+                  "modelscore": modelScore(estimator, X_test, y_test, labels),
+                  "model": estimator})
+   return result
+
+
+def fitFold(modelName, estimator, X, Y, train_index, test_index, labels):
+   """
+     Method Name: fitFold
+     Description:This function trains and scores one candidate model on one fold of the cross
+                 validation. X is the memory mapped feature matrix shared by all the tasks, only
+                 the rows of the fold are copied
+     Input: modelName, estimator(the untrained model), X, Y, train_index, test_index, labels
+     Output: Dictionary of the model name, score, fit time and iterations
+     Written By: Anupam Hore
+     Version: 1.0
+     Revisions: None
+   """
+   result = fitAndScore(modelName, estimator, X[train_index], Y[train_index], X[test_index], Y[test_index], labels)
+   del result['model']
+   return result
+
+
+def fitPath(modelName, estimator, Cs, X_train, y_train, X_test, y_test, labels):
+   """
+     Method Name: fitPath
+     Description:This function trains one candidate model for every C of Cs, in the given order.
+                 The model is warm started, so every fit starts from the coefficients of the
+                 previous C instead of zero and needs only a few iterations
+     Input: modelName, estimator(the untrained model), Cs, X_train, y_train, X_test, y_test, labels
+     Output: Dictionary of fitAndScore for the best C, with the path of every C
+     Written By: Anupam Hore
+     Version: 1.1
+     Revisions: Records the convergence and the loss of every C
+   """
+   finalModel(estimator).set_params(warm_start=True)
+   path = []
+   best = None
+   for C in Cs:
+      finalModel(estimator).set_params(C=C)
+      result = fitAndScore(modelName, estimator, X_train, y_train, X_test, y_test, labels)
+      path.append(dict({key: value for key, value in result.items() if key != 'model'}, C=C))
+      if best is None or result['modelscore'] > best['modelscore']:
+         best = dict(result, model=copy.deepcopy(estimator))
+   best['path'] = path
+   return best
+
 
 class Model_Finder:
 
+   labels = [1, 2, 3, 4, 5, 6, 7]
+   solvers = [("Logistic Regression lbfgs", 'lbfgs'),
+              ("Logistic Regression newton_cg", 'newton-cg'),
+              ("Logistic Regression saga", 'saga'),
+              ("Logistic Regression sag", 'sag')]
+   # search space of the hyper parameter tuning, C is sampled log uniform in C_range
+   C_range = (1e-3, 1e3)
+   class_weights = [None, 'balanced']
+   penalties = {'lbfgs': ['l2'], 'newton-cg': ['l2'], 'sag': ['l2'], 'saga': ['l1', 'l2', 'elasticnet']}
+   # C of the regularization path, from the weakest to the strongest regularization
+   path_Cs = list(np.logspace(3, -3, 13))
+
    def __init__(self,logger):
       self.logger = logger
       self.file_object = open("Training_Logs/BestModelLog.txt", 'a+')
+      # record of every fit of the run, for trainingReport
+      self.fits = []
+
+   def recordFits(self, stage, results):
+      """
+        Method Name: recordFits
+        Description:This class keeps the records of the fits of a stage of the model selection for
+                    the training report, the fits which did not converge are logged. The fits which
+                    copied the float32 features to float64 are logged too
+        Input: stage(name of the stage), results(records of fitModel with the model name)
+        Output: None
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: Logs the float64 copies of the float32 features
+      """
+      upcasts = 0
+      for result in results:
+         record = {key: result[key] for key in ['solver', 'rows', 'fit_time', 'n_iter', 'converged', 'loss', 'dtype', 'upcast']}
+         record.update({'stage': stage, 'modelName': result['modelName']})
+         self.fits.append(record)
+         upcasts = upcasts + record['upcast']
+         if not record['converged']:
+            self.logger.log(self.file_object, "%s %s did not converge in %s iterations on %s rows"
+                            % (stage, record['modelName'], record['n_iter'], record['rows']))
+      if upcasts > 0:
+         self.logger.log(self.file_object, "%s %s fits of the %s solvers copied the float32 features to float64"
+                         % (stage, upcasts, float64_solvers))
+
+   def trainingReport(self):
+      """
+        Method Name: trainingReport
+        Description:This class reports where the training time of the run went. The fit time,
+                    number of fits and fits which did not converge are summed per stage and per
+                    solver, with the slowest fits and the number of fits which copied the float32
+                    features to float64
+        Output: Dictionary of the report, which can be saved as json
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: Counts the float64 copies of the float32 features
+      """
+      try:
+         total = sum(record['fit_time'] for record in self.fits)
+         report = {'fits': len(self.fits), 'fit_time': total,
+                   'not_converged': sum(not record['converged'] for record in self.fits),
+                   'upcast': sum(record['upcast'] for record in self.fits)}
+         for group in ['stage', 'solver']:
+            summary = {}
+            for record in self.fits:
+               entry = summary.setdefault(record[group], {'fits': 0, 'fit_time': 0.0, 'not_converged': 0, 'iterations': 0})
+               entry['fits'] = entry['fits'] + 1
+               entry['fit_time'] = entry['fit_time'] + record['fit_time']
+               entry['not_converged'] = entry['not_converged'] + (not record['converged'])
+               entry['iterations'] = entry['iterations'] + (record['n_iter'] or 0)
+            report[group + 's'] = summary
+         report['slowest'] = sorted(self.fits, key=lambda record: record['fit_time'], reverse=True)[:5]
+
+         self.logger.log(self.file_object, "Training report: %s fits took %.3f seconds, %s did not converge, %s copied the float32 features to float64"
+                         % (report['fits'], total, report['not_converged'], report['upcast']))
+         for group in ['stages', 'solvers']:
+            for name, entry in report[group].items():
+               self.logger.log(self.file_object, "Training report %s %s: %s fits %.3f seconds (%.1f%%) %s iterations, %s did not converge"
+                               % (group[:-1], name, entry['fits'], entry['fit_time'], 100.0 * entry['fit_time'] / max(total, 1e-12),
+                                  entry['iterations'], entry['not_converged']))
+         return report
 
+      except Exception as e:
+         self.logger.log(self.file_object, "trainingReport Error: %s" % Exception(e))
+         raise Exception(e)
 
 
-   def get_best_params_for_logisticRegression_lbfgs(self,X_train, y_train):
+   def get_incremental_logisticRegression(self):
 
       """
-        Method Name: get_best_params_for_logisticRegression1
-        Description:This class trains the data based on hyper parameter tuning
-        Input: X_train, y_train
-        Output: model name, model itself
+        Method Name: get_incremental_logisticRegression
+        Description:This class gives a logistic regression model trained with stochastic gradient
+                    descent. It can be trained chunk by chunk with partial_fit, for the data which
+                    does not fit in the memory
+        Output: the untrained model
         Written By: Anupam Hore
         Version: 1.0
         Revisions: None
       """
-      self.logger.log(self.file_object, "get_best_params_for_logisticRegression_lbfgs Started!!!")
+      self.logger.log(self.file_object, "get_incremental_logisticRegression Started!!!")
       try:
-         log_reg = LogisticRegression(solver='lbfgs', multi_class='ovr')
-         log_reg.fit(X_train, y_train)
-         self.logger.log(self.file_object, "get_best_params_for_logisticRegression_lbfgs Completed!!!")
+         log_reg = SGDClassifier(loss='log_loss', random_state=100)
+         self.logger.log(self.file_object, "get_incremental_logisticRegression Completed!!!")
          return log_reg
 
-
       except Exception as e:
-         self.logger.log(self.file_object, "logisticRegression_lbfgs Error: %s"%Exception(e))
+         self.logger.log(self.file_object, "incremental_logisticRegression Error: %s" % Exception(e))
          raise Exception(e)
 
-   def get_best_params_for_logisticRegression_newton_cg(self, X_train, y_train):
+   def getModelScore(self,model,X,Y):
 
       """
-        Method Name: get_best_params_for_logisticRegression1
-        Description:This class trains the data based on hyper parameter tuning
-        Input: X_train, y_train
-        Output: model name, model itself
+        Method Name: getModelScore
+        Description:This class calculate the model score based on y_pred, y_test
+        Input: X,Y
+        Output: score of the model
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None
+        Version: 1.1
+        Revisions: The classes which are not in Y are left out of the average
       """
-      self.logger.log(self.file_object, "get_best_params_for_logisticRegression_newton_cg Started!!!")
+      self.logger.log(self.file_object, "getModelScore Started!!!")
       try:
-         log_reg = LogisticRegression(solver='newton-cg', multi_class='ovr')
-         log_reg.fit(X_train, y_train)
-         self.logger.log(self.file_object, "get_best_params_for_logisticRegression_newton_cg Completed!!!")
-         return log_reg
-
+         score = modelScore(model, X, Y, self.labels)
+         self.logger.log(self.file_object, "getModelScore Completed!!!")
+         return score
 
       except Exception as e:
-         self.logger.log(self.file_object, "logisticRegression_newton_cg Error: %s" % Exception(e))
+         self.logger.log(self.file_object, "getModelScore Error: %s"%Exception(e))
          raise Exception(e)
 
-   def get_best_params_for_logisticRegression_saga(self, X_train, y_train):
 
+
+   def sample_configurations(self, n_configs, solvers=None, random_state=100):
       """
-        Method Name: get_best_params_for_logisticRegression1
-        Description:This class trains the data based on hyper parameter tuning
-        Input: X_train, y_train
-        Output: model name, model itself
+        Method Name: sample_configurations
+        Description:This class samples the hyper parameter configurations of the search. The
+                    solvers take turns, the first configuration of every solver is its default
+                    (C 1.0, l2 penalty, no class weights) and the others have a log uniform C,
+                    a penalty supported by the solver and random class weights
+        Input: n_configs(number of configurations), solvers(None for all the solvers),
+               random_state
+        Output: list of the parameters of LogisticRegression
         Written By: Anupam Hore
         Version: 1.0
         Revisions: None
       """
-      self.logger.log(self.file_object, "get_best_params_for_logisticRegression_saga Started!!!")
+      rng = np.random.RandomState(random_state)
+      solvers = solvers if solvers is not None else [solver for _, solver in self.solvers]
+      configs = []
+      for i in range(n_configs):
+         solver = solvers[i % len(solvers)]
+         if i < len(solvers):
+            configs.append({'solver': solver, 'C': 1.0, 'penalty': 'l2', 'class_weight': None})
+            continue
+         params = {'solver': solver,
+                   'C': float(10 ** rng.uniform(np.log10(self.C_range[0]), np.log10(self.C_range[1]))),
+                   'penalty': self.penalties[solver][rng.randint(len(self.penalties[solver]))],
+                   'class_weight': self.class_weights[rng.randint(len(self.class_weights))]}
+         if params['penalty'] == 'elasticnet':
+            params['l1_ratio'] = float(rng.uniform())
+         configs.append(params)
+      return configs
+
+   def search_logisticRegression(self, X_train, y_train, solvers=None, n_configs=27, factor=3,
+                                 validation_size=0.2, min_rows=100, random_state=100, n_jobs=-1):
+      """
+        Method Name: search_logisticRegression
+        Description:This class searches the hyper parameters of the logistic regression with
+                    successive halving. A part of the training data is kept for validation and
+                    the rest is shuffled. Every round trains the remaining configurations in
+                    parallel on the first rows of the shuffled data and keeps the best 1/factor
+                    of them for the next round, which has factor times more rows. The rounds stop
+                    when one configuration is left, so the last round trains factor
+                    configurations on 1/factor of the rows and 27 configurations with factor 3
+                    cost about three trainings on the kept rows. The best configuration is then
+                    trained once on the whole training data
+        Input: X_train, y_train, solvers(None for all the solvers), n_configs, factor,
+               validation_size, min_rows(least rows of a round), random_state,
+               n_jobs(number of workers, -1 for all the cpus)
+        Output: model name, model itself
+        Written By: Anupam Hore
+        Version: 1.2
+        Revisions: Records the convergence and the loss of every fit. Stops the rounds when one
+                   configuration is left instead of training it on all the rows before the refit
+      """
+      self.logger.log(self.file_object, "search_logisticRegression Started!!!")
       try:
-         log_reg = LogisticRegression(solver='saga', multi_class='ovr')
-         log_reg.fit(X_train, y_train)
-         self.logger.log(self.file_object, "get_best_params_for_logisticRegression_saga Completed!!!")
-         return log_reg
-
+         configs = self.sample_configurations(n_configs, solvers, random_state)
+         X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=validation_size,
+                                                       stratify=y_train, random_state=random_state)
+         n_rounds, n_left = 0, len(configs)
+         while n_left > 1:
+            n_rounds, n_left = n_rounds + 1, max(n_left // factor, 1)
+
+         self.searchHistory = []
+         with Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r') as parallel:
+            for n_round in range(n_rounds):
+               n_rows = min(max(int(len(X_fit) / factor ** (n_rounds - n_round)), min_rows), len(X_fit))
+               results = parallel(
+                  delayed(fitAndScore)(str(params), makeModel(params),
+                                       X_fit[:n_rows], y_fit[:n_rows], X_val, y_val, self.labels)
+                  for params in configs)
+
+               self.recordFits('search round %s' % n_round, results)
+               for params, result in zip(configs, results):
+                  self.searchHistory.append({'round': n_round, 'rows': n_rows, 'params': params, 'score': result['modelscore'],
+                                             'fit_time': result['fit_time'], 'n_iter': result['n_iter'], 'converged': result['converged']})
+               self.logger.log(self.file_object, "search_logisticRegression round %s trained %s configurations on %s rows, best score: %s"
+                               % (n_round, len(configs), n_rows, max(result['modelscore'] for result in results)))
+
+               order = np.argsort([-result['modelscore'] for result in results], kind='stable')
+               configs = [configs[i] for i in order[:max(len(configs) // factor, 1)]]
+
+         best = configs[0]
+         model = makeModel(best)
+         modelName = "Logistic Regression " + best['solver'].replace('-', '_')
+         result = fitModel(model, X_train, y_train)
+         self.recordFits('search refit', [dict(result, modelName=modelName)])
+         self.searchHistory.append({'round': n_rounds, 'rows': len(X_train), 'params': best, 'score': None,
+                                    'fit_time': result['fit_time'], 'n_iter': result['n_iter'], 'converged': result['converged']})
+
+         self.logger.log(self.file_object, "search_logisticRegression best parameters: %s" % best)
+         self.logger.log(self.file_object, "search_logisticRegression Completed!!!")
+         return modelName, model
 
       except Exception as e:
-         self.logger.log(self.file_object, "logisticRegression_saga Error: %s" % Exception(e))
+         self.logger.log(self.file_object, "search_logisticRegression Error: %s" % Exception(e))
          raise Exception(e)
 
-   def get_best_params_for_logisticRegression_sag(self, X_train, y_train):
-
+   def regularization_path(self, X_train, y_train, solvers=None, Cs=None, validation_size=0.2,
+                           random_state=100, n_jobs=-1):
       """
-        Method Name: get_best_params_for_logisticRegression1
-        Description:This class trains the data based on hyper parameter tuning
-        Input: X_train, y_train
+        Method Name: regularization_path
+        Description:This class tunes the C of the logistic regression of every solver along a
+                    regularization path. The solvers run in parallel, every solver trains the
+                    decreasing sequence of C with warm start, carrying the coefficients forward,
+                    and is scored with a validation part of the training data. The best model
+                    is trained again on the whole training data, starting from its coefficients
+        Input: X_train, y_train, solvers(None for all the solvers), Cs(None for path_Cs),
+               validation_size, random_state, n_jobs(number of workers, -1 for all the cpus)
         Output: model name, model itself
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None
+        Version: 1.1
+        Revisions: Records the convergence and the loss of every fit
       """
-      self.logger.log(self.file_object, "get_best_params_for_logisticRegression_saga Started!!!")
+      self.logger.log(self.file_object, "regularization_path Started!!!")
       try:
-         log_reg = LogisticRegression(solver='sag', multi_class='ovr')
-         log_reg.fit(X_train, y_train)
-         self.logger.log(self.file_object, "get_best_params_for_logisticRegression_sag Completed!!!")
-         return log_reg
-
+         Cs = sorted(Cs if Cs is not None else self.path_Cs, reverse=True)
+         candidates = [(modelName, estimator) for modelName, estimator in self.get_candidates()
+                       if solvers is None or finalModel(estimator).solver in solvers]
+         X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=validation_size,
+                                                       stratify=y_train, random_state=random_state)
+
+         results = Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r')(
+            delayed(fitPath)(modelName, estimator, Cs, X_fit, y_fit, X_val, y_val, self.labels)
+            for modelName, estimator in candidates)
+
+         self.pathHistory = {}
+         for result in results:
+            self.pathHistory[result['modelName']] = result['path']
+            self.recordFits('regularization path', result['path'])
+            self.logger.log(self.file_object, "regularization_path %s best C: %s score: %s iterations of the path: %s"
+                            % (result['modelName'], finalModel(result['model']).C, result['modelscore'], [step['n_iter'] for step in result['path']]))
+
+         best = max(results, key=lambda result: result['modelscore'])
+         model = best['model']
+         self.recordFits('regularization path refit', [dict(fitModel(model, X_train, y_train), modelName=best['modelName'])])
+         finalModel(model).set_params(warm_start=False)
+
+         self.logger.log(self.file_object, "regularization_path Completed!!!")
+         return best['modelName'], model
 
       except Exception as e:
-         self.logger.log(self.file_object, "logisticRegression_sag Error: %s" % Exception(e))
+         self.logger.log(self.file_object, "regularization_path Error: %s" % Exception(e))
          raise Exception(e)
 
-   def getModelScore(self,model,X,Y):
+   def retrain_model(self, X_train, y_train, X_test, y_test, modelName):
+      """
+        Method Name: retrain_model
+        Description:This class trains the saved model again on new training data. The model keeps
+                    its hyper parameters and starts from its saved coefficients, so on data which
+                    has changed little it converges in a few iterations. When the saved model has
+                    other features or classes it is trained from zero with the same parameters
+        Input: X_train, y_train, X_test, y_test, modelName(name of the saved model)
+        Output: model name, model itself
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: Records the convergence and the loss of the fit
+      """
+      self.logger.log(self.file_object, "retrain_model Started!!!")
+      try:
+         previous = File_Operation(self.logger).load_model(modelName)
+         model = clone(previous)
+
+         features = list(X_train.columns) if hasattr(X_train, 'columns') else None
+         same_features = finalModel(previous).coef_.shape[1] == X_train.shape[1] and \
+                         (features is None or list(getattr(previous, 'feature_names_in_', features)) == features)
+         same_classes = np.array_equal(previous.classes_, np.unique(y_train))
+         if same_features and same_classes:
+            finalModel(model).set_params(warm_start=True)
+            finalModel(model).coef_ = finalModel(previous).coef_.copy()
+            finalModel(model).intercept_ = finalModel(previous).intercept_.copy()
+         else:
+            self.logger.log(self.file_object, "retrain_model the features or the classes of %s have changed, training from zero" % modelName)
+
+         result = fitModel(model, X_train, y_train)
+         finalModel(model).set_params(warm_start=False)
+         self.recordFits('retrain', [dict(result, modelName=modelName)])
+         self.logger.log(self.file_object, "retrain_model %s score: %s fit time: %.3f seconds iterations: %s (saved model: %s)"
+                         % (modelName, self.getModelScore(model, X_test, y_test), result['fit_time'],
+                            result['n_iter'], int(np.max(finalModel(previous).n_iter_))))
+
+         self.logger.log(self.file_object, "retrain_model Completed!!!")
+         return modelName, model
 
+      except Exception as e:
+         self.logger.log(self.file_object, "retrain_model Error: %s" % Exception(e))
+         raise Exception(e)
+
+   def cross_validate_candidates(self, X, Y, candidates=None, n_folds=5, random_state=100, n_jobs=-1):
       """
-        Method Name: getModelScore
-        Description:This class calculate the model score based on y_pred, y_test
-        Input: X,Y
-        Output: score of the model
+        Method Name: cross_validate_candidates
+        Description:This class scores the candidate models with stratified k fold cross
+                    validation. The folds are made once and every fold of every candidate is
+                    one task of a single parallel job. The feature matrix is written once to a
+                    memory mapped file which all the workers read, instead of being pickled for
+                    every task. The scores are aggregated per candidate as mean and standard
+                    deviation. A float feature matrix keeps its dtype, so a float32 matrix is
+                    not doubled in memory for the folds
+        Input: X, Y, candidates(list of model name, untrained model, None for get_candidates),
+               n_folds, random_state, n_jobs(number of workers, -1 for all the cpus)
+        Output: list of Dictionary with the model name, mean score, standard deviation of the
+                scores, scores of the folds and the fit time of every candidate, best first
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None
+        Version: 1.2
+        Revisions: Records the convergence and the loss of every fit. Keeps the float dtype of X
       """
-      self.logger.log(self.file_object, "getModelScore Started!!!")
+      self.logger.log(self.file_object, "cross_validate_candidates Started!!!")
+      folder = tempfile.mkdtemp(prefix='cv_')
       try:
-         y_pred1 = model.predict(X)
-         labels = [1, 2, 3, 4, 5, 6, 7]
-         y_pred1 = label_binarize(y_pred1, classes=labels)
-         score = roc_auc_score(Y, y_pred1, average='macro', multi_class='ovr')
-         self.logger.log(self.file_object, "getModelScore Completed!!!")
-         return score
+         candidates = candidates if candidates is not None else self.get_candidates()
+         values = np.asarray(X)
+         if not np.issubdtype(values.dtype, np.floating):
+            values = values.astype(np.float64)
+         target = np.asarray(Y)
+         folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state).split(values, target))
+
+         path = os.path.join(folder, 'X.mmap')
+         joblib.dump(values, path)
+         values = joblib.load(path, mmap_mode='r')
+
+         start = time.perf_counter()
+         results = Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r')(
+            delayed(fitFold)(modelName, clone(estimator), values, target, train_index, test_index, self.labels)
+            for modelName, estimator in candidates for train_index, test_index in folds)
+
+         self.recordFits('cross validation', results)
+         self.cvScores = []
+         for i, (modelName, estimator) in enumerate(candidates):
+            fold_results = results[i * n_folds:(i + 1) * n_folds]
+            scores = np.array([result['modelscore'] for result in fold_results])
+            self.cvScores.append({'modelName': modelName, 'estimator': estimator,
+                                  'modelscore': float(scores.mean()), 'std': float(scores.std(ddof=1)),
+                                  'scores': scores.tolist(), 'fit_time': sum(result['fit_time'] for result in fold_results)})
+            self.logger.log(self.file_object, "cross_validate_candidates %s score: %.6f +/- %.6f fit time: %.3f seconds"
+                            % (modelName, scores.mean(), scores.std(ddof=1), self.cvScores[-1]['fit_time']))
+         self.cvScores.sort(key=lambda x: x['modelscore'], reverse=True)
+
+         self.logger.log(self.file_object, "cross_validate_candidates %s folds of %s candidates took %.3f seconds"
+                         % (n_folds, len(candidates), time.perf_counter() - start))
+         self.logger.log(self.file_object, "cross_validate_candidates Completed!!!")
+         return self.cvScores
 
       except Exception as e:
-         self.logger.log(self.file_object, "getModelScore Error: %s"%Exception(e))
+         self.logger.log(self.file_object, "cross_validate_candidates Error: %s" % Exception(e))
          raise Exception(e)
 
+      finally:
+         shutil.rmtree(folder, ignore_errors=True)
 
+   def get_candidates(self):
+      """
+        Method Name: get_candidates
+        Description:This class gives the untrained candidate models of get_best_model, one logistic
+                    regression for every solver. The gradient solvers are given standardized
+                    features (makeModel)
+        Output: list of model name, untrained model
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: Standardization step of the gradient solvers
+      """
+      return [(modelName, makeModel({'solver': solver})) for modelName, solver in self.solvers]
 
-   def get_best_model(self,X_train, y_train, X_test, y_test):
+   def get_best_model(self,X_train, y_train, X_test, y_test, n_jobs=-1, search=True, path=False, cv=None):
       """
         Method Name: get_best_model
         Description:This class trains various model with the training data set and
                     tries to find out the best model while calculating the accuracy
-                    with the test data set
-        Input: X_train, y_train, X_test, y_test
+                    with the test data set.
+                    The candidates are independent, they are trained and scored at the same time
+                    on a pool of worker processes. The large arrays are memory mapped once and
+                    shared read only by the workers instead of being copied to every worker.
+                    With search the candidates are the configurations of the successive halving
+                    search (search_logisticRegression), which includes the default model of
+                    every solver, and the best one is scored with the test data set.
+                    With path the C of every solver is tuned along a warm started regularization
+                    path (regularization_path) instead.
+                    With cv the default model of every solver is chosen with cv fold cross
+                    validation of the training data (cross_validate_candidates) and the chosen
+                    one is trained on the whole training data
+        Input: X_train, y_train, X_test, y_test, n_jobs(number of workers, -1 for all the cpus),
+               search(False trains only the default model of every solver),
+               path(tune C along the regularization path), cv(number of folds, None for no
+               cross validation)
         Output: model name, model itself
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None
+        Version: 1.5
+        Revisions: Searches the hyper parameters with successive halving. Regularization path.
+                   Cross validation. Records the convergence of every fit
       """
       self.logger.log(self.file_object,"get_best_model Started!!!")
       try:
+         start = time.perf_counter()
+         if path:
+            modelName, model = self.regularization_path(X_train, y_train, n_jobs=n_jobs)
+            self.scoreList = [dict(self.fits[-1], modelscore=self.getModelScore(model, X_test, y_test), model=model)]
+         elif cv is not None:
+            best = self.cross_validate_candidates(X_train, y_train, n_folds=cv, n_jobs=n_jobs)[0]
+            self.scoreList = [fitAndScore(best['modelName'], clone(best['estimator']), X_train, y_train, X_test, y_test, self.labels)]
+            self.recordFits('cross validation refit', self.scoreList)
+         elif search:
+            modelName, model = self.search_logisticRegression(X_train, y_train, n_jobs=n_jobs)
+            self.scoreList = [dict(self.fits[-1], modelscore=self.getModelScore(model, X_test, y_test), model=model)]
+         else:
+            candidates = self.get_candidates()
+            self.scoreList = Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r')(
+               delayed(fitAndScore)(modelName, clone(estimator), X_train, y_train, X_test, y_test, self.labels)
+               for modelName, estimator in candidates)
+            self.recordFits('race', self.scoreList)
+         self.logger.log(self.file_object, "get_best_model model selection took %.3f seconds" % (time.perf_counter() - start))
+
+         for result in self.scoreList:
+            self.logger.log(self.file_object, "%s score: %s fit time: %.3f seconds iterations: %s converged: %s loss: %.6f"
+                            % (result['modelName'], result['modelscore'], result['fit_time'], result['n_iter'],
+                               result['converged'], result['loss']))
 
-         # Logistic Regression for solver lbfgs
-         self.log_reg1 = self.get_best_params_for_logisticRegression_lbfgs(X_train, y_train)
-         self.log_reg_score1 = self.getModelScore(self.log_reg1,X_test,y_test)
-
-         # Logistic Regression for solver newton_cg
-         self.log_reg2 = self.get_best_params_for_logisticRegression_newton_cg(X_train, y_train)
-         self.log_reg_score2 = self.getModelScore(self.log_reg2,X_test,y_test)
-
-         # Logistic Regression for solver saga
-         self.log_reg3 = self.get_best_params_for_logisticRegression_saga(X_train, y_train)
-         self.log_reg_score3 = self.getModelScore(self.log_reg3,X_test,y_test)
-
-
-         # Logistic Regression for solver sag
-         self.log_reg4 = self.get_best_params_for_logisticRegression_sag(X_train, y_train)
-         self.log_reg_score4 = self.getModelScore(self.log_reg4,X_test,y_test)
-
-         self.scoreList = [
-            {"modelName": "Logistic Regression lbfgs", "modelscore": self.log_reg_score1, "model": self.log_reg1},
-            {"modelName": "Logistic Regression newton_cg", "modelscore": self.log_reg_score2, "model": self.log_reg2},
-            {"modelName": "Logistic Regression saga", "modelscore": self.log_reg_score3, "model": self.log_reg3},
-            {"modelName": "Logistic Regression sag", "modelscore": self.log_reg_score4, "model": self.log_reg4}]
          self.scoreList.sort(key=lambda x: x['modelscore'], reverse=True)
          modelObject = self.scoreList[0]
 
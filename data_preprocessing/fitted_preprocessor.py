@@ -0,0 +1,97 @@
+import numpy as np
+
+class FittedPreprocessor:
+    """
+        This class shall be used to keep the statistics learned by the Preprocessor stages on
+        the training data, so that the same treatment is applied to the data at prediction.
+
+        The statistics are kept as one array per stage, in the order of the input columns:
+            zero_values - replacement of the zeros (imputeZeros)
+            fill_values - replacement of the missing values (impute_missingValues)
+            lower/upper - clipping bounds (compute_outlier_bounds), -inf/inf when not treated
+        After the feature selection only the selected features are given by transform.
+
+        transform is a few array operations on the whole block of rows, the statistics are
+        not computed again.
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+    """
+    def __init__(self, columns, zero_values, fill_values, lower, upper, features=None):
+        self.columns = list(columns)
+        self.zero_values = np.asarray(zero_values, dtype=np.float64)
+        self.fill_values = np.asarray(fill_values, dtype=np.float64)
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.select(features)
+
+    def select(self, features):
+        """
+        Method Name: select
+        Description: This function sets the features given by transform, after the feature selection
+        Parameter: features(list of the selected columns, None gives all the columns)
+        Output: None
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        self.features = list(features) if features is not None else list(self.columns)
+        self.positions = np.array([self.columns.index(col) for col in self.features], dtype=np.int64)
+
+    def transform(self, X):
+        """
+        Method Name: transform
+        Description: This function replaces the zeros and the missing values and clips the
+                     outliers of the rows with the fitted statistics
+        Parameter: X(2d array of the rows in the order of the columns)
+        Output: 2d float array of the selected features
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        X = np.array(X, dtype=np.float64)
+        np.copyto(X, np.broadcast_to(self.zero_values, X.shape), where=(X == 0))
+        np.copyto(X, np.broadcast_to(self.fill_values, X.shape), where=np.isnan(X))
+        np.clip(X, self.lower, self.upper, out=X)
+        if len(self.positions) != len(self.columns) or np.any(self.positions != np.arange(len(self.columns))):
+            X = X[:, self.positions]
+        return X
+
+    def to_arrays(self):
+        """
+        Method Name: to_arrays
+        Description: This function gives the statistics as arrays, to be saved with numpy
+        Output: Dictionary of arrays
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        return {'columns': np.array(self.columns, dtype=str),
+                'features': np.array(self.features, dtype=str),
+                'zero_values': self.zero_values,
+                'fill_values': self.fill_values,
+                'lower': self.lower,
+                'upper': self.upper}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Method Name: from_arrays
+        Description: This function builds the fitted preprocessor from the saved arrays
+        Parameter: arrays(Dictionary of arrays given by to_arrays)
+        Output: FittedPreprocessor
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        return cls(arrays['columns'].tolist(), arrays['zero_values'], arrays['fill_values'],
+                   arrays['lower'], arrays['upper'], arrays['features'].tolist())
@@ -3,6 +3,9 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 import scipy.stats as stats
 from sklearn.preprocessing import StandardScaler
+from concurrent.futures import ThreadPoolExecutor
+from data_preprocessing.fitted_preprocessor import FittedPreprocessor
+from data_preprocessing.streaming_stats import StreamingStatistics
 
 class Preprocessor:
     """
@@ -13,6 +16,12 @@ class Preprocessor:
         Revisions: None
 
     """
+    target_mapping = {'bending1': 1, 'bending2': 2, 'cycling': 3, 'lying': 4, 'sitting': 5, 'standing': 6, 'walking': 7}
+
+    # distribution type of every column needing outlier treatment
+    outlier_rules = {'avg_rss12': 'Skewed', 'var_rss12': 'Highly Skewed', 'avg_rss13': 'Gaussian',
+                     'var_rss13': 'Highly Skewed', 'avg_rss23': 'Gaussian', 'var_rss23': 'Skewed'}
+
     def __init__(self, file_object,logger):
         self.logger = logger
         self.file_object = file_object
@@ -32,7 +41,11 @@ class Preprocessor:
         self.logger.log(self.file_object, "map_target_variable method Started!!!")
         try:
 
-            df[labelName] = df[labelName].map({'bending1': 1, 'bending2': 2, 'cycling': 3, 'lying': 4, 'sitting': 5, 'standing': 6, 'walking': 7})
+            mapped = df[labelName].map(self.target_mapping)
+            if isinstance(mapped.dtype, pd.CategoricalDtype):
+                # the training store keeps the label as categorical, only its categories were mapped
+                mapped = mapped.astype(mapped.cat.categories.dtype)
+            df[labelName] = mapped
 
             self.logger.log(self.file_object, "map_target_variable method Completed!!!")
 
@@ -96,8 +109,8 @@ class Preprocessor:
         On Failure: Exception
 
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None
+        Version: 1.1
+        Revisions: The null counts of all the columns are checked with one array operation
         """
         self.logger.log(self.file_object, "Missing Value Search Started")
         null_present = False
@@ -105,11 +118,9 @@ class Preprocessor:
         columns_with_missing_values = []
         try:
 
-            null_counts = df.isnull().sum()
-            for i in range(len(null_counts)):
-                if null_counts[i] > 0:
-                    null_present = True
-                    columns_with_missing_values.append(cols[i])
+            null_counts = df.isnull().to_numpy().sum(axis=0)
+            columns_with_missing_values = list(cols[null_counts > 0])
+            null_present = len(columns_with_missing_values) > 0
 
             if null_present:
                 self.logger.log(self.file_object,"Missing Value Columns are %s"%columns_with_missing_values)
@@ -156,6 +167,101 @@ class Preprocessor:
             self.logger.log(self.file_object, "Error imputing missing values %s" %Exception(e))
             raise Exception(e)
 
+    def imputation_statistics(self, values, sample_size=100000, keep_zeros=None):
+        """
+        Method Name: imputation_statistics
+        Description: This function calculates the imputation values of all the columns of a float
+                     array and fills the array in place. The null mask, the zero mask and the mean
+                     are taken in one pass. Only the columns with missing values are sorted, to find
+                     their distinct values, median and mode. The other columns get the median of an
+                     evenly spaced sample of at most sample_size rows as fill value, which is used
+                     on new data only. The zeros of the keep_zeros columns are values, their zero
+                     replacement is 0 and they are not changed
+        Parameter: values(2d float array, changed in place),
+                   sample_size(rows used for the median of the columns without missing values),
+                   keep_zeros(positions of the columns whose zeros are kept, None for no column)
+        Output: zero replacement, missing value replacement, count of zeros, count of missing values
+                (one for each column)
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: Keeps the zeros of the keep_zeros columns
+        """
+        null_mask = np.isnan(values)
+        null_counts = null_mask.sum(axis=0)
+        zero_mask = values == 0
+        if keep_zeros is not None and len(keep_zeros) > 0:
+            zero_mask[:, keep_zeros] = False
+        zero_counts = zero_mask.sum(axis=0)
+
+        # imputeZeros: the mean of the non missing values is taken before the zeros are replaced
+        zero_values = np.sum(values, axis=0, where=~null_mask, dtype=np.float64) / np.maximum(values.shape[0] - null_counts, 1)
+        if keep_zeros is not None and len(keep_zeros) > 0:
+            zero_values[keep_zeros] = 0
+        np.copyto(values, np.broadcast_to(zero_values, values.shape), where=zero_mask)
+        del zero_mask
+
+        missing = np.flatnonzero(null_counts > 0)
+        complete = np.flatnonzero(null_counts == 0)
+
+        fill_values = np.full(values.shape[1], np.nan)
+        if len(complete) > 0 and values.shape[0] > 0:
+            step = max(values.shape[0] // sample_size, 1)
+            fill_values[complete] = np.median(values[::step, complete], axis=0)
+        if len(missing) > 0:
+            # impute_missingValues: median of continous columns, mode of discrete columns
+            distinct, medians, modes = self.sorted_statistics(values[:, missing], mode_limit=10)
+            fill_values[missing] = np.where(distinct > 10, medians, modes)
+            np.copyto(values, np.broadcast_to(fill_values, values.shape), where=null_mask)
+
+        return zero_values, fill_values, zero_counts, null_counts
+
+    def sorted_statistics(self, values, mode_limit=None):
+        """
+        Method Name: sorted_statistics
+        Description: This function finds the number of distinct values, the median and the mode of
+                     every column of a float array with one sort of the array. The missing values
+                     are not counted. The mode is the most frequent value, the smallest one on a tie
+        Parameter: values(2d float array), mode_limit(the mode is found only for the columns with
+                   at most mode_limit distinct values, None finds it for all the columns)
+        Output: distinct value counts, medians, modes (nan for the columns without mode)
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        ordered = np.sort(values, axis=0)  # the missing values are sorted to the end
+        present = ~np.isnan(ordered)
+        valid = present.sum(axis=0)
+
+        new = np.ones(ordered.shape, dtype=bool)
+        new[1:] = ordered[1:] != ordered[:-1]
+        new &= present
+        distinct = new.sum(axis=0)
+
+        medians = np.full(values.shape[1], np.nan)
+        has = np.flatnonzero(valid > 0)
+        medians[has] = (ordered[(valid[has] - 1) // 2, has] + ordered[valid[has] // 2, has]) / 2
+
+        modes = np.full(values.shape[1], np.nan)
+        discrete = np.flatnonzero(distinct <= mode_limit) if mode_limit is not None else np.arange(values.shape[1])
+        if len(discrete) == 0:
+            return distinct, medians, modes
+
+        # length of every run of equal values, runs listed column by column
+        col, row = np.nonzero(new[:, discrete].T)
+        valid = valid[discrete]
+        same_col = np.append(col[1:] == col[:-1], False)
+        end = np.where(same_col, np.append(row[1:], 0), valid[col])
+        length = end - row
+        order = np.lexsort((row, -length, col))
+        first = order[np.append(True, col[order][1:] != col[order][:-1])] if len(order) > 0 else order
+
+        modes[discrete[col[first]]] = ordered[row[first], discrete[col[first]]]
+        return distinct, medians, modes
+
     def impute_infs(self,df,cols):
         """
         Method Name: impute_infs
@@ -207,89 +313,118 @@ class Preprocessor:
             raise Exception(e)
 
 
-    def outlier_treatment(self,df, cols,distType):
+    def compute_outlier_bounds(self, values, columns, rules):
         """
-        Method Name: outlier_treatment
-        Description: This function is responsible for the outlier treatment
-        Parameter: df(the dataframe), cols ( the columns), distType(list of variable distribution types)
-                   Depending on the distribution, we will treat the outliers for the variables
-        Output: Dataset with outlier imputed
+        Method Name: compute_outlier_bounds
+        Description: This function calculates the clipping bounds of the outlier treatment for all
+                     the columns of an array in one pass: the mean and the std of the Gaussian
+                     columns and the quartiles of the skewed columns are each calculated with one
+                     vectorized call over the columns
+        Parameter: values(2d array of the rows), columns(the column names of the array),
+                   rules(Dictionary of the distribution type of the columns needing treatment)
+        Output: lower bounds, upper bounds (one for each column, columns without outlier
+                treatment get -inf and inf)
         On Failure: Exception
 
         Written By: Anupam Hore
         Version: 1.0
         Revisions: None
         """
-        self.logger.log(self.file_object, "outlier_treatment Started!!!")
-        isLengthEqual = True
         try:
-            if len(cols) == len(distType):
-                count = 0
-                for col in cols:
-                    distributionType = distType[count]
-
-                    if distributionType == "Gaussian":
-                        upper_bound = df[col].mean() + 3 * df[col].std()
-                        lower_bound = df[col].mean() - 3 * df[col].std()
-                        df[col].clip(upper=upper_bound, inplace=True)
-                        df[col].clip(lower=lower_bound, inplace=True)
-
-                    elif distributionType == "Skewed":
-                        IQR = df[col].quantile(0.75) - df[col].quantile(0.25)
-                        upper_bound = df[col].quantile(0.75) + 1.5 * IQR
-                        lower_bound = df[col].quantile(0.25) - 1.5 * IQR
-                        df[col].clip(upper=upper_bound, inplace=True)
-                        df[col].clip(lower=lower_bound, inplace=True)
+            columns = list(columns)
+            positions = np.array([columns.index(col) for col in rules], dtype=np.int64)
+            distTypes = list(rules.values())
+            gaussian = np.array([dist == "Gaussian" for dist in distTypes], dtype=bool)
+
+            mean = np.zeros(len(positions))
+            std = np.zeros(len(positions))
+            q1 = np.zeros(len(positions))
+            q3 = np.zeros(len(positions))
+            if gaussian.any():
+                block = values[:, positions[gaussian]]
+                mean[gaussian] = block.mean(axis=0, dtype=np.float64)
+                std[gaussian] = block.std(axis=0, ddof=1, dtype=np.float64)
+            if (~gaussian).any():
+                q1[~gaussian], q3[~gaussian] = np.quantile(values[:, positions[~gaussian]], [0.25, 0.75], axis=0)
+
+            return self.outlier_rule_bounds(len(columns), positions, distTypes, mean, std, q1, q3)
 
-                    else:
-                        IQR = df[col].quantile(0.75) - df[col].quantile(0.25)
-                        upper_bound = df[col].quantile(0.75) + 3 * IQR
-                        lower_bound = df[col].quantile(0.25) - 3 * IQR
-                        df[col].clip(upper=upper_bound, inplace=True)
-                        df[col].clip(lower=lower_bound, inplace=True)
+        except Exception as e:
+            self.logger.log(self.file_object, "Outlier Bounds Error: %s"%Exception(e))
+            raise Exception(e)
 
-                    count = count + 1
-                self.logger.log(self.file_object, "outlier_treatment Completed!!!")
-                return isLengthEqual, df
+    def outlier_rule_bounds(self, n_columns, positions, distTypes, mean, std, q1, q3):
+        """
+        Method Name: outlier_rule_bounds
+        Description: This function applies the rule of the distribution type to the statistics
+                     of the treated columns. Gaussian: mean -/+ 3 std, Skewed: quartiles -/+ 1.5 IQR,
+                     Highly Skewed: quartiles -/+ 3 IQR
+        Parameter: n_columns(number of columns), positions(positions of the treated columns),
+                   distTypes(distribution types of the treated columns),
+                   mean, std, q1, q3(statistics of the treated columns)
+        Output: lower bounds, upper bounds
+        On Failure: Exception
 
-            else:
-                isLengthEqual = False
-                self.logger.log(self.file_object, "Length of columns and length of distributions mismatch!!!")
-                return isLengthEqual, df
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        gaussian = np.array([dist == "Gaussian" for dist in distTypes], dtype=bool)
+        factor = np.array([1.5 if dist == "Skewed" else 3 for dist in distTypes], dtype=np.float64)
+        IQR = q3 - q1
 
-        except Exception as e:
-            self.logger.log(self.file_object, "Outlier Imputation Error: %s"%Exception(e))
-            raise Exception(e)
+        lower = np.full(n_columns, -np.inf)
+        upper = np.full(n_columns, np.inf)
+        lower[positions] = np.where(gaussian, mean - 3 * std, q1 - factor * IQR)
+        upper[positions] = np.where(gaussian, mean + 3 * std, q3 + factor * IQR)
+        return lower, upper
 
-    def separate_cat_num(self,df):
+    def separate_cat_num(self, df, cache=None, sample_size=None):
         """
         Method Name: separate_cat_num
-        Description: This function separates the categorical variables and the numerical variable
-        Parameter: df(the dataframe)
+        Description: This function separates the categorical variables and the numerical variable.
+                     A column is numerical when it has more than 19 distinct values, the counting
+                     of a column stops as soon as it has crossed 19 distinct values
+        Parameter: df(the dataframe),
+                   cache(Dictionary of the types already inferred, keyed by column name and dtype.
+                   The types inferred now are added to it),
+                   sample_size(count the distinct values on a random sample of rows, None counts
+                   on all the rows)
         Output: categorical vars, numerical vars
         On Failure: Exception
 
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None:
+        Version: 1.1
+        Revisions: Early stopping distinct count, cache of the inferred types, optional sample
         """
         self.logger.log(self.file_object, "separate_cat_num Started!!!")
         self.logger.log(self.file_object,"X columns: %s"%df.columns)
         try:
+            if cache is None:
+                cache = {}
             categorical_features = []
             numerical_features = []
-            features = df.columns
-            for feature in features:
-                if df[feature].dtypes == 'object':
-                    categorical_features.append(feature)
-                else:
-                    #check if the feature is a discrete variable or not
-                    discreteVar = pd.Categorical(df[feature])
-                    if len(discreteVar.categories) > 19:
-                        #that means its numerical
-                        numerical_features.append(feature)
+
+            rows = None
+            if sample_size is not None and len(df) > sample_size:
+                rows = np.sort(np.random.RandomState(100).choice(len(df), sample_size, replace=False))
+
+            for feature in df.columns:
+                key = "%s:%s" % (feature, df[feature].dtype)
+                if key not in cache:
+                    if df[feature].dtypes == 'object':
+                        cache[key] = 'categorical'
                     else:
-                        categorical_features.append(feature)
+                        #check if the feature is a discrete variable or not
+                        values = df[feature].to_numpy()
+                        if rows is not None:
+                            values = values[rows]
+                        cache[key] = 'numerical' if self.countDistinct(values, 19) > 19 else 'categorical'
+
+                if cache[key] == 'numerical':
+                    numerical_features.append(feature)
+                else:
+                    categorical_features.append(feature)
 
             self.logger.log(self.file_object, "separate_cat_num Completed!!!")
             return categorical_features, numerical_features
@@ -300,36 +435,109 @@ class Preprocessor:
 
 
 
-    def checkforMultiCollinearity(self, df, threshold):
+    def countDistinct(self, values, limit, block_size=4096):
+        """
+        Method Name: countDistinct
+        Description: This function counts the distinct values of a column block by block and stops
+                     as soon as the count is higher than the limit, so a continous column is
+                     decided from its first rows. The blocks double in size, a discrete column
+                     is read in a few blocks. The missing values are not counted
+        Parameter: values(array of the column), limit(the distinct count which stops the counting),
+                   block_size(rows of the first block)
+        Output: count of distinct values, limit + 1 or more when the count was stopped
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        seen = np.empty(0, dtype=values.dtype)
+        start = 0
+        while start < len(values):
+            block = values[start:start + block_size]
+            if block.dtype.kind == 'f':
+                block = block[~np.isnan(block)]
+            seen = np.union1d(seen, block)
+            if len(seen) > limit:
+                break
+            start = start + block_size
+            block_size = block_size * 2
+        return len(seen)
+
+    def checkforMultiCollinearity(self, df, threshold, corr=None):
         """
         Method Name: checkforMultiCollinearity
         Description: This function find out the variables which have high multi-collinearity among themselves.
+                     The pairs of columns are compared with one masked array operation on the
+                     correlation matrix
 
-        Parameter: df(the dataframe), threshold(cut off value till what multi-collinearity is accepted)
+        Parameter: df(the dataframe), threshold(cut off value till what multi-collinearity is accepted),
+                   corr(correlation matrix of the columns of df given by correlationMatrix, it is
+                   calculated when not given)
         Output: List of high multi-collinear variables
         On Failure: Exception
 
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None:
+        Version: 1.1
+        Revisions: Vectorized comparison, accepts the correlation matrix calculated before
         """
         self.logger.log(self.file_object, "checkforMultiCollinearity Started!!!")
         try:
-            corr_set = set()
-            corr_matrix = df.corr()
-            for i in range(len(corr_matrix.columns)):
-                for j in range(i):
-                    if corr_matrix.iloc[i, j] > threshold:
-                        colName = corr_matrix.columns[i]
-                        corr_set.add(colName)
+            if corr is None:
+                corr = self.correlationMatrix(df)
+            corr_set = self.findCollinearFromCorrelation(corr, list(df.columns), threshold)
 
             self.logger.log(self.file_object, "checkforMultiCollinearity Completed!!!")
-            return list(corr_set)
+            return corr_set
 
         except Exception as e:
             self.logger.log(self.file_object, "Finding Multi-Collinearity Failed: %s"%Exception(e))
             raise Exception(e)
 
+    def correlationMatrix(self, df, chunk_size=1000000, n_workers=1):
+        """
+        Method Name: correlationMatrix
+        Description: This function calculates the pearson correlation matrix of the columns with
+                     StreamingStatistics. The rows are read in chunks, so the memory used depends on
+                     the chunk size. With more than one worker the chunks are accumulated on a
+                     thread pool and the statistics of the chunks are merged
+        Parameter: df(the dataframe), chunk_size(rows per chunk), n_workers(number of threads)
+        Output: 2d array of correlations
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        self.logger.log(self.file_object, "correlationMatrix Started!!!")
+        try:
+            columns = list(df.columns)
+            values = df.to_numpy()
+
+            def accumulate(start):
+                chunk_stats = StreamingStatistics(columns, sample_size=0)
+                chunk_stats.update(values[start:start + chunk_size])
+                return chunk_stats
+
+            starts = range(0, max(len(values), 1), chunk_size)
+            if n_workers > 1:
+                with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                    parts = list(executor.map(accumulate, starts))
+                moments = parts[0]
+                for part in parts[1:]:
+                    moments.merge(part)
+            else:
+                moments = StreamingStatistics(columns, sample_size=0)
+                for start in starts:
+                    moments.update(values[start:start + chunk_size])
+
+            self.logger.log(self.file_object, "correlationMatrix Completed!!!")
+            return moments.correlation()
+
+        except Exception as e:
+            self.logger.log(self.file_object, "Correlation Error: %s"%Exception(e))
+            raise Exception(e)
+
     def scaleData(self, data):
         """
         Method Name: scaleData
@@ -354,11 +562,245 @@ class Preprocessor:
             self.logger.log(self.file_object, "StandardScaler Conversion Failed: %s" % Exception(e))
             raise Exception(e)
 
+    def map_target_codes(self, codes, categories):
+        """
+        Method Name: map_target_codes
+        Description: This function maps the categorical codes of the target variable, as they are
+                     kept in the training store, to the numerical numbers of map_target_variable
+        Parameter: codes(array of label codes), categories(label name of every code)
+        Output: array of the mapped target variable
+        On Failure: Exception
 
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        try:
+            lookup = np.array([self.target_mapping[category] for category in categories])
+            return lookup[np.asarray(codes)]
 
+        except Exception as e:
+            self.logger.log(self.file_object, "Mapping Error: %s"%Exception(e))
+            raise Exception(e)
 
+    def outlier_bounds(self, column_stats, rules):
+        """
+        Method Name: outlier_bounds
+        Description: This function calculates the clipping bounds of compute_outlier_bounds from the
+                     streaming statistics of the data instead of the dataframe.
+                     Gaussian: mean -/+ 3 std, Skewed: quartiles -/+ 1.5 IQR,
+                     Highly Skewed: quartiles -/+ 3 IQR
+        Parameter: column_stats(StreamingStatistics of the data),
+                   rules(Dictionary of the distribution type of every column needing treatment)
+        Output: lower bounds, upper bounds (one for each column of the statistics, columns
+                without outlier treatment get -inf and inf)
+        On Failure: Exception
 
+        Written By: Anupam Hore
+        Version: 1.2
+        Revisions: Declarative rules. The column_stats parameter does not hide scipy.stats
+        """
+        self.logger.log(self.file_object, "outlier_bounds Started!!!")
+        try:
+            positions = np.array([column_stats.columns.index(col) for col in rules], dtype=np.int64)
+            q1, q3 = column_stats.quantile([0.25, 0.75])
+            lower, upper = self.outlier_rule_bounds(len(column_stats.columns), positions, list(rules.values()),
+                                                    column_stats.mean()[positions], column_stats.std()[positions],
+                                                    q1[positions], q3[positions])
+
+            self.logger.log(self.file_object, "outlier_bounds Completed!!!")
+            return lower, upper
+
+        except Exception as e:
+            self.logger.log(self.file_object, "Outlier Bounds Error: %s"%Exception(e))
+            raise Exception(e)
+
+    def imputation_values(self, column_stats):
+        """
+        Method Name: imputation_values
+        Description: This function calculates the replacement values of imputation_statistics from
+                     the streaming statistics of the data instead of the array. The zeros are
+                     replaced by the mean of the non missing values. The missing values are
+                     replaced by the median (continous) or the mode (discrete) of the column after
+                     the zeros are replaced, which is estimated on the sample of the statistics.
+                     The columns without missing values get the median
+        Parameter: column_stats(StreamingStatistics of the data)
+        Output: zero replacement, missing value replacement (one for each column)
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: The column_stats parameter does not hide scipy.stats
+        """
+        try:
+            zero_values = column_stats.mean()
+            sample = np.array(column_stats.sample, dtype=np.float64)
+            np.copyto(sample, np.broadcast_to(zero_values, sample.shape), where=(sample == 0))
+
+            distinct, medians, modes = self.sorted_statistics(sample, mode_limit=10)
+            missing = column_stats.count < column_stats.rows_seen
+            fill_values = np.where(missing & (distinct <= 10), modes, medians)
+            return zero_values, fill_values
+
+        except Exception as e:
+            self.logger.log(self.file_object, "Imputation Values Error: %s"%Exception(e))
+            raise Exception(e)
+
+    def transform_chunk(self, chunk, means, medians, lower, upper):
+        """
+        Method Name: transform_chunk
+        Description: This function applies imputeZeros, impute_missingValues and the outlier clipping
+                     to a chunk of rows with statistics calculated before, so that every chunk
+                     of the data is treated the same way. The chunk is changed in place
+        Parameter: chunk(2d float array), means(zero replacement of every column),
+                   medians(missing value replacement of every column),
+                   lower, upper(clipping bounds of every column)
+        Output: The treated chunk
+        On Failure: Exception
 
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        try:
+            np.copyto(chunk, np.broadcast_to(means, chunk.shape), where=(chunk == 0))
+            np.copyto(chunk, np.broadcast_to(medians, chunk.shape), where=np.isnan(chunk))
+            np.clip(chunk, lower, upper, out=chunk)
+            return chunk
 
+        except Exception as e:
+            self.logger.log(self.file_object, "Chunk Transformation Error: %s"%Exception(e))
+            raise Exception(e)
 
+    def fit_pipeline(self, df, rules, keep_zeros=None):
+        """
+        Method Name: fit_pipeline
+        Description: This function learns the statistics of imputeZeros, impute_missingValues and
+                     the outlier treatment on the training data, in the same order as those stages:
+                     the zeros are replaced by the mean of the column, the missing values by the
+                     median (continous) or the mode (discrete) and the outliers are clipped with
+                     the bounds of the distribution type. The statistics are kept in a
+                     FittedPreprocessor which is saved with the model.
+                     The features are copied once into a float block, which is imputed and
+                     clipped in place while the statistics are learned, so the treated training
+                     data is given without transforming it again
+        Parameter: df(the dataframe of the independant variables),
+                   rules(Dictionary of the distribution type of every column needing outlier treatment),
+                   keep_zeros(columns whose zeros are values and are not replaced, None for no column)
+        Output: FittedPreprocessor, Dataframe of the treated independant variables
+        On Failure: Exception
 
+        Written By: Anupam Hore
+        Version: 1.2
+        Revisions: Gives the treated training data. Keeps the zeros of the keep_zeros columns
+        """
+        self.logger.log(self.file_object, "fit_pipeline Started!!!")
+        try:
+            values = df.to_numpy(dtype=np.float64, copy=True)
+            pipeline = self.fit_block(values, list(df.columns), rules, clip=True, keep_zeros=keep_zeros)
+
+            self.logger.log(self.file_object, "fit_pipeline Completed!!!")
+            return pipeline, pd.DataFrame(values, columns=df.columns, index=df.index, copy=False)
+
+        except Exception as e:
+            self.logger.log(self.file_object, "Preprocessing Pipeline Error: %s"%Exception(e))
+            raise Exception(e)
+
+    def fit_block(self, values, columns, rules, clip=False, keep_zeros=None):
+        """
+        Method Name: fit_block
+        Description: This function learns the statistics of fit_pipeline on an array of the
+                     independant variables. The zeros and the missing values of the array are
+                     filled in place and, when clip is True, the outliers are clipped in place,
+                     so the array is transformed without a copy and keeps its dtype
+        Parameter: values(2d float array, changed in place), columns(the column names of the array),
+                   rules(Dictionary of the distribution type of every column needing outlier treatment),
+                   clip(clip the outliers of the array),
+                   keep_zeros(columns whose zeros are values and are not replaced, None for no column)
+        Output: FittedPreprocessor
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: Keeps the zeros of the keep_zeros columns
+        """
+        try:
+            # imputeZeros and impute_missingValues, the array is filled in place
+            positions = [columns.index(col) for col in keep_zeros] if keep_zeros is not None else None
+            zero_values, fill_values, zero_counts, null_counts = self.imputation_statistics(values, keep_zeros=positions)
+            self.logger.log(self.file_object, "Imputed Zeros: %s" % dict(zip(columns, zero_counts.tolist())))
+            self.logger.log(self.file_object, "Imputed Missing Values: %s" % dict(zip(columns, null_counts.tolist())))
+
+            # outlier treatment: clipping bounds of the distribution type
+            lower, upper = self.compute_outlier_bounds(values, columns, rules)
+            if clip:
+                np.clip(values, lower.astype(values.dtype), upper.astype(values.dtype), out=values)
+
+            return FittedPreprocessor(columns, zero_values, fill_values, lower, upper)
+
+        except Exception as e:
+            self.logger.log(self.file_object, "Preprocessing Pipeline Error: %s"%Exception(e))
+            raise Exception(e)
+
+    def compact_split(self, df, labelName, drop=()):
+        """
+        Method Name: compact_split
+        Description: This function separates the independant and dependant variables in the compact
+                     memory layout: the features are copied column by column into one float32
+                     block (every column contiguous) and the target variable is mapped to int8
+                     numbers. It replaces map_target_variable, separate_label_features and
+                     dropVariables, which copy the whole dataframe each
+        Parameter: df(the dataframe), labelName(the target Variable name), drop(columns to leave out)
+        Output: float32 array of the independant variables, their column names, int8 dependant variable
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        self.logger.log(self.file_object, "compact_split Started!!!")
+        try:
+            columns = [col for col in df.columns if col != labelName and col not in drop]
+            values = np.empty((len(df), len(columns)), dtype=np.float32, order='F')
+            for j, col in enumerate(columns):
+                values[:, j] = df[col].to_numpy()
+
+            label = df[labelName]
+            if isinstance(label.dtype, pd.CategoricalDtype):
+                codes = self.map_target_codes(label.cat.codes.to_numpy(), list(label.cat.categories))
+            else:
+                codes = label.map(self.target_mapping).to_numpy()
+            Y = pd.Series(codes.astype(np.int8), name=labelName)
+
+            self.logger.log(self.file_object, "Compact Layout: float32 features %s, int8 label" % (values.shape,))
+            self.logger.log(self.file_object, "compact_split Completed!!!")
+            return values, columns, Y
+
+        except Exception as e:
+            self.logger.log(self.file_object, "Compact Split Error: %s"%Exception(e))
+            raise Exception(e)
+
+    def findCollinearFromCorrelation(self, corr, columns, threshold):
+        """
+        Method Name: findCollinearFromCorrelation
+        Description: This function finds out the variables with high multi-collinearity from a
+                     correlation matrix which is already calculated. Like checkforMultiCollinearity,
+                     a column is reported when its correlation with any column before it is
+                     higher than the threshold
+        Parameter: corr(2d array of correlations), columns(the column names),
+                   threshold(cut off value till what multi-collinearity is accepted)
+        Output: List of high multi-collinear variables
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        try:
+            lower_triangle = np.tril(np.ones(corr.shape, dtype=bool), k=-1)
+            high = (np.asarray(corr) > threshold) & lower_triangle
+            return [columns[i] for i in np.flatnonzero(high.any(axis=1))]
+
+        except Exception as e:
+            self.logger.log(self.file_object, "Finding Multi-Collinearity Failed: %s"%Exception(e))
+            raise Exception(e)
@@ -0,0 +1,206 @@
+import numpy as np
+
+class StreamingStatistics:
+    """
+        This class shall be used to compute the preprocessing statistics of a dataset which
+        is read chunk by chunk, so the memory used does not depend on the size of the dataset.
+
+        Per column it keeps the count of non missing values, the count of zeros, the sum and
+        the sum of squares, the min and the max. For the correlation it keeps the mean and the
+        co-moment matrix of the complete rows, updated with the pairwise formula of Chan et al.
+        The quantiles are estimated from a fixed size uniform reservoir sample of the rows.
+        The statistics of different parts of the data, accumulated by different workers, are
+        combined with merge.
+
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: Added merge
+    """
+    def __init__(self, columns, sample_size=100000, random_state=100):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.count = np.zeros(p)
+        self.zero_count = np.zeros(p)
+        self.sum = np.zeros(p)
+        self.sum_sq = np.zeros(p)
+        self.min = np.full(p, np.inf)
+        self.max = np.full(p, -np.inf)
+
+        self.n_complete = 0
+        self.complete_mean = np.zeros(p)
+        self.comoment = np.zeros((p, p))
+
+        self.sample_size = sample_size
+        self.sample = np.empty((0, p))
+        self.rows_seen = 0
+        self.rng = np.random.default_rng(random_state)
+
+    def update(self, chunk):
+        """
+        Method Name: update
+        Description: This function adds a chunk of rows to the statistics
+        Parameter: chunk(2d array of the rows, in the order of the columns)
+        Output: None
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        notnull = ~np.isnan(chunk)
+        values = np.where(notnull, chunk, 0.0)
+
+        self.count += notnull.sum(axis=0)
+        self.zero_count += (chunk == 0).sum(axis=0)
+        self.sum += values.sum(axis=0)
+        self.sum_sq += (values * values).sum(axis=0)
+        if len(chunk) > 0:
+            self.min = np.fmin(self.min, np.nanmin(np.where(notnull, chunk, np.inf), axis=0))
+            self.max = np.fmax(self.max, np.nanmax(np.where(notnull, chunk, -np.inf), axis=0))
+
+        complete = chunk[notnull.all(axis=1)]
+        n_b = len(complete)
+        if n_b > 0:
+            mean_b = complete.mean(axis=0)
+            centered = complete - mean_b
+            comoment_b = centered.T @ centered
+
+            n_a = self.n_complete
+            n = n_a + n_b
+            delta = mean_b - self.complete_mean
+            self.comoment += comoment_b + np.outer(delta, delta) * (n_a * n_b / n)
+            self.complete_mean += delta * (n_b / n)
+            self.n_complete = n
+
+        self.updateSample(chunk)
+
+    def updateSample(self, chunk):
+        """
+        Method Name: updateSample
+        Description: This function keeps a uniform reservoir sample of the rows seen so far.
+                     Every row of the chunk replaces a random row of the reservoir with the
+                     probability sample_size / rows seen
+        Parameter: chunk(2d array of the rows)
+        Output: None
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        free = self.sample_size - len(self.sample)
+        if free > 0:
+            self.sample = np.vstack([self.sample, chunk[:free]])
+            self.rows_seen += min(free, len(chunk))
+            chunk = chunk[free:]
+
+        if len(chunk) > 0:
+            positions = self.rows_seen + np.arange(1, len(chunk) + 1)
+            slots = (self.rng.random(len(chunk)) * positions).astype(np.int64)
+            keep = slots < self.sample_size
+            self.sample[slots[keep]] = chunk[keep]
+            self.rows_seen += len(chunk)
+
+    def merge(self, other):
+        """
+        Method Name: merge
+        Description: This function adds the statistics of another part of the data, as if its rows
+                     had been given to update. The co-moments are combined with the formula of
+                     Chan et al. and the reservoir keeps a uniform sample of the rows of both parts
+        Parameter: other(StreamingStatistics of the same columns)
+        Output: None
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        if other.columns != self.columns:
+            raise ValueError("The statistics are not of the same columns")
+
+        self.count += other.count
+        self.zero_count += other.zero_count
+        self.sum += other.sum
+        self.sum_sq += other.sum_sq
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+
+        n_a = self.n_complete
+        n_b = other.n_complete
+        if n_b > 0:
+            n = n_a + n_b
+            delta = other.complete_mean - self.complete_mean
+            self.comoment += other.comoment + np.outer(delta, delta) * (n_a * n_b / n)
+            self.complete_mean += delta * (n_b / n)
+            self.n_complete = n
+
+        # the rows of the merged sample are drawn from the parts in proportion to their rows
+        rows_seen = self.rows_seen + other.rows_seen
+        if len(self.sample) + len(other.sample) <= self.sample_size:
+            self.sample = np.vstack([self.sample, other.sample])
+        else:
+            n_self = self.rng.hypergeometric(self.rows_seen, other.rows_seen, self.sample_size)
+            n_self = min(max(n_self, self.sample_size - len(other.sample)), len(self.sample))
+            keep_self = self.rng.choice(len(self.sample), n_self, replace=False)
+            keep_other = self.rng.choice(len(other.sample), self.sample_size - n_self, replace=False)
+            self.sample = np.vstack([self.sample[keep_self], other.sample[keep_other]])
+        self.rows_seen = rows_seen
+
+    def mean(self):
+        """
+        Method Name: mean
+        Description: This function gives the mean of the non missing values of every column
+        Output: array of means
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        return self.sum / np.maximum(self.count, 1)
+
+    def std(self):
+        """
+        Method Name: std
+        Description: This function gives the sample standard deviation of every column
+        Output: array of standard deviations
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        mean = self.mean()
+        var = (self.sum_sq - self.count * mean * mean) / np.maximum(self.count - 1, 1)
+        return np.sqrt(np.maximum(var, 0.0))
+
+    def quantile(self, q):
+        """
+        Method Name: quantile
+        Description: This function estimates the quantiles of every column from the sample
+        Parameter: q(quantile or list of quantiles)
+        Output: array of quantiles, one row per quantile when a list is given
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        return np.nanquantile(self.sample, q, axis=0)
+
+    def correlation(self):
+        """
+        Method Name: correlation
+        Description: This function gives the pearson correlation matrix of the complete rows
+        Output: 2d array of correlations
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        scale = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoment / np.outer(scale, scale)
+        return corr
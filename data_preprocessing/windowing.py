@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+class WindowFeatures:
+    """
+        This class shall be used to turn the 250 ms readings of every recording into features
+        of sliding windows, before the data is given to the Preprocessor.
+
+        Every raw file is one contiguous recording of one activity, the recording metadata
+        table of train_validation (offset and rows of every recording in the master data)
+        tells where a recording starts and ends. The windows never cross two recordings.
+        The windows are strided views of the readings and every aggregation is computed for
+        all the windows and columns at once:
+            mean, std, min, max - of the readings of the window
+            slope               - least squares slope of the readings, per second
+            energy              - mean of the squared readings of the window
+        The std and the slope of a constant window are 0, their zeros are values and not
+        missing readings (zeroValuedFeatures).
+
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: The windows are views of every recording. The zeros of std and slope are values
+    """
+    aggregations_supported = ['mean', 'std', 'min', 'max', 'slope', 'energy']
+    zero_valued_aggregations = ['std', 'slope']
+
+    def __init__(self, file_object, logger, window=8, stride=4, aggregations=None):
+        self.logger = logger
+        self.file_object = file_object
+        self.window = int(window)
+        self.stride = int(stride)
+        self.aggregations = list(aggregations) if aggregations is not None else list(self.aggregations_supported)
+
+        if self.window < 2 or self.stride < 1:
+            raise ValueError("Window must be at least 2 rows and stride at least 1 row")
+        unknown = [agg for agg in self.aggregations if agg not in self.aggregations_supported]
+        if len(unknown) > 0:
+            raise ValueError("Unknown aggregations: %s" % unknown)
+
+    def windowStarts(self, recordings):
+        """
+        Method Name: windowStarts
+        Description: This function finds out the first row of every window. A recording of n rows
+                     has the windows starting at 0, stride, 2*stride ... up to n - window
+        Parameter: recordings(recording metadata table with offset and rows of every recording)
+        Output: array of the first rows of the windows, array of the recording of every window
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        offsets = recordings['offset'].to_numpy(dtype=np.int64)
+        rows = recordings['rows'].to_numpy(dtype=np.int64)
+        counts = np.maximum((rows - self.window) // self.stride + 1, 0)
+
+        recording = np.repeat(np.arange(len(counts)), counts)
+        # position of every window inside its recording
+        position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return offsets[recording] + position * self.stride, recording
+
+    def zeroValuedFeatures(self, columns):
+        """
+        Method Name: zeroValuedFeatures
+        Description: This function finds out the window features whose zeros are values, the std
+                     and the slope of the constant windows. The Preprocessor keeps their zeros
+                     instead of replacing them as missing readings
+        Parameter: columns(the window feature columns)
+        Output: list of the window features whose zeros are values
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        return [col for col in columns
+                if any(col.endswith('_' + agg) for agg in self.zero_valued_aggregations)]
+
+    def transform(self, df, recordings, labelName='Label', columns=None):
+        """
+        Method Name: transform
+        Description: This function computes the window features of every recording of the
+                     master data. The label of a window is the label of its recording
+        Parameter: df(the master dataframe), recordings(recording metadata table of the rows of df),
+                   labelName(the target variable name),
+                   columns(the reading columns to aggregate, None takes every feature column
+                   except the time and the index)
+        Output: Dataframe with one row per window, the columns are named <column>_<aggregation>
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: The windows of every recording are a strided view of its readings, they are
+                   never copied
+        """
+        self.logger.log(self.file_object, "WindowFeatures transform Started!!!")
+        try:
+            if recordings is None:
+                raise Exception("The recording metadata is needed to find the windows of every recording")
+            if int(recordings['rows'].sum()) != len(df):
+                raise Exception("The recording metadata has %s rows, the data has %s rows" % (recordings['rows'].sum(), len(df)))
+
+            if columns is None:
+                columns = [col for col in df.columns if col not in [labelName, 'Unnamed: 0', '# Columns: time']]
+
+            values = df[columns].to_numpy(dtype=np.float64)
+            starts, recording = self.windowStarts(recordings)
+            offsets = recordings['offset'].to_numpy(dtype=np.int64)
+            rows = recordings['rows'].to_numpy(dtype=np.int64)
+            clocks = recordings['clock'].to_numpy(dtype=np.float64)
+            counts = np.bincount(recording, minlength=len(recordings))
+
+            t = np.arange(self.window, dtype=np.float64)
+            t = t - t.mean()
+            results = {agg: np.empty((len(starts), len(columns))) for agg in self.aggregations}
+            first = 0
+            for i in np.flatnonzero(counts):
+                # windows[k] is the view of rows k * stride .. k * stride + window - 1 of the recording,
+                # shape (windows, columns, window). The stride is a slice, so the windows stay a view
+                windows = sliding_window_view(values[offsets[i]:offsets[i] + rows[i]], self.window, axis=0)[::self.stride]
+                part = slice(first, first + counts[i])
+                first = first + counts[i]
+
+                for agg in self.aggregations:
+                    if agg == 'mean':
+                        results[agg][part] = windows.mean(axis=2)
+                    elif agg == 'std':
+                        results[agg][part] = windows.std(axis=2, ddof=1)
+                    elif agg == 'min':
+                        results[agg][part] = windows.min(axis=2)
+                    elif agg == 'max':
+                        results[agg][part] = windows.max(axis=2)
+                    elif agg == 'slope':
+                        # slope per row, the clock of the recording converts it to a slope per second
+                        results[agg][part] = np.einsum('ijk,k->ij', windows, t / (t @ t)) * (1000.0 / clocks[i])
+                    else:
+                        results[agg][part] = np.einsum('ijk,ijk->ij', windows, windows) / self.window
+
+            features = {}
+            for agg in self.aggregations:
+                for j, col in enumerate(columns):
+                    features[col + '_' + agg] = results[agg][:, j]
+
+            window_df = pd.DataFrame(features)
+            window_df[labelName] = df[labelName].array.take(starts)
+
+            self.logger.log(self.file_object, "WindowFeatures made %s windows from %s rows of %s recordings" % (len(window_df), len(df), len(recordings)))
+            self.logger.log(self.file_object, "WindowFeatures transform Completed!!!")
+            return window_df
+
+        except Exception as e:
+            self.logger.log(self.file_object, "WindowFeatures transform Error: %s" % Exception(e))
+            raise Exception(e)
@@ -1,46 +1,155 @@
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
+import hashlib
+import json
+import os
 from sklearn import metrics
-import statsmodels.formula.api as sm
-from statsmodels.stats.outliers_influence import variance_inflation_factor
-from sklearn.feature_selection import VarianceThreshold
 from sklearn.feature_selection import mutual_info_classif
+from sklearn.model_selection import train_test_split
+from joblib import Parallel, delayed
 
 class FeatureSelection:
     """
         This class shall  be used to select the best possible features for model training
 
+        The results of a feature selection can be cached on the disk, keyed by the fingerprint
+        of the data and the selection parameters. The cache is limited to cache_max_bytes,
+        the entries used least recently are removed first.
+
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None
+        Version: 1.1
+        Revisions: Added the cache of the feature selection results
     """
-    def __init__(self, logger):
+    def __init__(self, logger, cache_directory='Training_Data/FeatureSelectionCache', cache_max_bytes=1000000):
         self.logger = logger
         self.file_object = open("Training_Logs/FeatureSelection.txt", 'a+')
+        self.cache_directory = cache_directory
+        self.cache_max_bytes = cache_max_bytes
+
+    def fingerprint(self, X, Y, params):
+        """
+        Method Name: fingerprint
+        Description: This function calculates the fingerprint of the data and of the selection
+                     parameters, which is the key of the cached selection results
+        Parameter: X(independant vars), Y(target vars), params(Dictionary of the selection parameters)
+        Output: fingerprint (hex string)
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        try:
+            digest = hashlib.sha256()
+            digest.update(json.dumps({'columns': [str(col) for col in X.columns],
+                                      'dtypes': [str(dtype) for dtype in X.dtypes],
+                                      'shape': list(X.shape),
+                                      'params': params}, sort_keys=True).encode())
+            # column by column, so the fingerprint does not depend on the memory layout
+            values = X.to_numpy()
+            for j in range(values.shape[1]):
+                digest.update(np.ascontiguousarray(values[:, j]).data)
+            digest.update(np.ascontiguousarray(np.asarray(Y, dtype=np.float64)).data)
+            return digest.hexdigest()
+
+        except Exception as e:
+            self.logger.log(self.file_object, "fingerprint error: %s"%Exception(e))
+            raise Exception(e)
+
+    def loadCachedSelection(self, key):
+        """
+        Method Name: loadCachedSelection
+        Description: This function loads the selection results cached for the fingerprint
+        Parameter: key(fingerprint of the data and the parameters)
+        Output: Dictionary of the selection results, None when they are not cached
+        On Failure: None
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        path = os.path.join(self.cache_directory, key + '.json')
+        try:
+            if not os.path.isfile(path):
+                self.logger.log(self.file_object, "Feature Selection Cache Miss: %s" % key)
+                return None
+            with open(path, 'r') as f:
+                selection = json.load(f)
+            # the entry is now the most recently used one
+            os.utime(path)
+            self.logger.log(self.file_object, "Feature Selection Cache Hit: %s" % key)
+            return selection
 
+        except Exception as e:
+            # a broken entry is computed again
+            self.logger.log(self.file_object, "loadCachedSelection error: %s"%Exception(e))
+            return None
 
-    def findVIF_Factor(self, X):
+    def saveCachedSelection(self, key, selection):
+        """
+        Method Name: saveCachedSelection
+        Description: This function saves the selection results for the fingerprint and removes the
+                     entries used least recently while the cache is larger than cache_max_bytes
+        Parameter: key(fingerprint of the data and the parameters), selection(Dictionary of the
+                   selection results)
+        Output: None
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        try:
+            if not os.path.isdir(self.cache_directory):
+                os.makedirs(self.cache_directory)
+
+            tmp_path = os.path.join(self.cache_directory, 'tmp_' + key + '.json')
+            with open(tmp_path, 'w') as f:
+                json.dump(selection, f, indent=1)
+            os.replace(tmp_path, os.path.join(self.cache_directory, key + '.json'))
+
+            entries = []
+            for name in os.listdir(self.cache_directory):
+                path = os.path.join(self.cache_directory, name)
+                if name.endswith('.json') and not name.startswith('tmp_'):
+                    entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+            entries.sort()
+
+            total = sum(size for _, size, _ in entries)
+            while total > self.cache_max_bytes and len(entries) > 1:
+                _, size, path = entries.pop(0)
+                os.remove(path)
+                total = total - size
+                self.logger.log(self.file_object, "Feature Selection Cache Evicted: %s" % path)
+
+        except Exception as e:
+            self.logger.log(self.file_object, "saveCachedSelection error: %s"%Exception(e))
+            raise Exception(e)
+
+
+    def findVIF_Factor(self, X, corr=None):
         """
         Method Name: findVIF_Factor
         Description: This function finds out the variables with low VIF factors. Those variables
                      can be considered for model training
 
-        Parameter: X ( independant variables)
+        Parameter: X ( independant variables), corr(correlation matrix of the columns of X, as
+                   calculated for the multi-collinearity check. It is calculated when not given)
         Output: list of variables with low VIF
         On Failure: Exception
 
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None
+        Version: 1.1
+        Revisions: All the VIF are calculated at once from the correlation matrix
         """
         self.logger.log(self.file_object,"findVIF_Factor method Started!!!!")
         try:
-            scaler = StandardScaler()
-            arr = scaler.fit_transform(X)
+            if corr is None:
+                corr = np.corrcoef(X.to_numpy(dtype=np.float64), rowvar=False).reshape(X.shape[1], X.shape[1])
             vif = pd.DataFrame()
-            vif['VIF'] = [variance_inflation_factor(arr, i) for i in range(arr.shape[1])]
+            vif['VIF'] = self.varianceInflationFactors(corr)
             vif['Feature'] = X.columns
+            self.logger.log(self.file_object, "VIF: %s" % dict(zip(vif['Feature'], vif['VIF'])))
             series = vif[vif['VIF'] < 10]
             arr = list(series.Feature)
 
@@ -52,6 +161,38 @@ class FeatureSelection:
             self.logger.log(self.file_object, "findVIF_Factor error: %s"%Exception(e))
             raise Exception(e)
 
+    def varianceInflationFactors(self, corr, tol=1e-10):
+        """
+        Method Name: varianceInflationFactors
+        Description: This function calculates the VIF of all the variables at once. The VIF of a
+                     variable is the diagonal entry of the inverse of the correlation matrix, which
+                     is 1 / (1 - R squared) of the regression of the variable on the others.
+                     The inverse is taken from the eigen decomposition of the matrix: the
+                     directions with an eigen value below tol (singular matrix) are left out and
+                     the variables taking part in them get an infinite VIF. Constant variables
+                     have no correlation and get a nan VIF
+        Parameter: corr(correlation matrix), tol(eigen values treated as zero, relative to the
+                   largest one)
+        Output: array of VIF
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        corr = np.asarray(corr, dtype=np.float64)
+        vif = np.full(corr.shape[0], np.nan)
+        valid = np.flatnonzero(np.isfinite(np.diag(corr)))
+        if len(valid) == 0:
+            return vif
+
+        values, vectors = np.linalg.eigh(corr[np.ix_(valid, valid)])
+        singular = values <= tol * max(values.max(), tol)
+        weights = vectors * vectors
+        vif[valid] = (weights[:, ~singular] / values[~singular]).sum(axis=1)
+        vif[valid[weights[:, singular].sum(axis=1) > tol]] = np.inf
+        return vif
+
     def findFinalFeatures(self,high_collinear_vars, best_features, features_with_low_vif):
         """
         Method Name: findFinalFeatures
@@ -128,15 +269,14 @@ class FeatureSelection:
         On Failure: Exception
 
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None
+        Version: 1.1
+        Revisions: A column is constant when its min is its max, the data is not converted to float64
         """
         self.logger.log(self.file_object, "findConstantFeatures Started!!!")
         try:
-            var_threshold = VarianceThreshold(threshold=0)
-            var_threshold.fit(data)
-            #var_threshold.get_support() returns True,False for each variable
-            const_columns = [column for column in data.columns if column not in data.columns[var_threshold.get_support()]]
+            values = data.to_numpy()
+            constant = np.nanmin(values, axis=0) == np.nanmax(values, axis=0) if len(values) > 0 else np.ones(values.shape[1], dtype=bool)
+            const_columns = list(data.columns[constant])
             self.logger.log(self.file_object, "findConstantFeatures Completed!!!")
 
             return const_columns
@@ -146,35 +286,44 @@ class FeatureSelection:
 
             raise Exception(e)
 
-    def findbestFeatures(self,X,Y):
+    def findbestFeatures(self, X, Y, k=5, sample_size=100000, n_workers=-1, random_state=100):
         """
         Method Name: findbestFeatures
-        Description: This function helps to find out the 5 best features from the lot
-
-        Parameter: X(independant vars), Y(target vars)
-        Output: list of best feature columns
+        Description: This function helps to find out the k best features from the lot, ranked by
+                     their mutual information with the target. The mutual information is estimated
+                     on a stratified sample of the rows, one feature per worker process, with a
+                     fixed seed, so the same data always gives the same ranking. The features with
+                     the same mutual information keep their column order
+
+        Parameter: X(independant vars), Y(target vars), k(number of best features),
+                   sample_size(rows of the stratified sample, None uses all the rows),
+                   n_workers(number of worker processes, -1 uses all the cores),
+                   random_state(seed of the sample and of the estimation)
+        Output: list of best feature columns, the best first
         On Failure: Exception
 
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None
+        Version: 1.1
+        Revisions: The features are ranked (the sorted result was not used). Stratified sample,
+                   parallel estimation and fixed seed
         """
         self.logger.log(self.file_object,"findbestFeatures Started!!!")
         try:
-            mutual_info = mutual_info_classif(X, Y)
-            mutual_info = pd.Series(mutual_info)
-            mutual_info.index = X.columns
-            mutual_info.sort_values(ascending=False)
-
-            df = mutual_info.to_frame()
-            df = df.reset_index()
-            arr = df.to_numpy()
-            sorted_best_features = []
-            count = 0
-            for list_ in arr:
-                if count < 5:
-                    sorted_best_features.append(list_[0])
-                count = count + 1
+            values = X.to_numpy()
+            target = np.asarray(Y)
+            if sample_size is not None and len(values) > sample_size:
+                values, _, target, _ = train_test_split(values, target, train_size=sample_size,
+                                                        stratify=target, random_state=random_state)
+
+            n_workers = 1 if values.shape[1] < 2 else n_workers
+            scores = Parallel(n_jobs=n_workers)(
+                delayed(mutual_info_classif)(values[:, [j]], target, random_state=random_state)
+                for j in range(values.shape[1]))
+
+            mutual_info = pd.Series(np.concatenate(scores) if len(scores) > 0 else [], index=X.columns, dtype=np.float64)
+            self.logger.log(self.file_object, "Mutual Information: %s" % mutual_info.to_dict())
+
+            sorted_best_features = list(mutual_info.sort_values(ascending=False, kind='stable').index[:k])
             self.logger.log(self.file_object, "findbestFeatures Completed!!!")
             return sorted_best_features
 
@@ -1,6 +1,9 @@
 import pickle
 import os
 import shutil
+import json
+import numpy as np
+from data_preprocessing.fitted_preprocessor import FittedPreprocessor
 
 class File_Operation:
 
@@ -9,21 +12,24 @@ class File_Operation:
         self.file_object = open("Training_Logs/ModelFileOps.txt", 'a+')
         self.model_directory = 'models/'
 
-    def save_model(self, model, filename):
+    def save_model(self, model, filename, metadata=None):
         """
           Method Name: save_model
           Description:This class saves the respective model with the filename in the model directory
+          Parameter: model, filename, metadata(Dictionary saved next to the model, like the features
+                     the model was trained on)
           Output: None
           Written By: Anupam Hore
-          Version: 1.0
-          Revisions: None
+          Version: 1.2
+          Revisions: Saves the model metadata. Only the old version of the same model is removed,
+                     the other models are kept
         """
         self.logger.log(self.file_object,'save_model Started!!!')
         try:
             path = os.path.join(self.model_directory, filename)
 
             if os.path.isdir(path):
-                shutil.rmtree(self.model_directory)
+                shutil.rmtree(path)
                 os.makedirs(path)
             else:
                 os.makedirs(path)
@@ -31,6 +37,10 @@ class File_Operation:
             with open(path + "/" + filename + '.sav', 'wb') as f:
                 pickle.dump(model, f)
 
+            if metadata is not None:
+                with open(path + "/" + filename + '.json', 'w') as f:
+                    json.dump(metadata, f, indent=1)
+
             self.logger.log(self.file_object, 'save_model Completed!!!')
             return 'success'
 
@@ -58,4 +68,100 @@ class File_Operation:
             self.logger.log(self.file_object, 'load_model Error: %s' % Exception(e))
             raise Exception(e)
 
+    def load_metadata(self, filename):
+        """
+          Method Name: load_metadata
+          Description:This class loads the metadata saved with the model
+          Output: Dictionary of the metadata, empty when the model has no metadata
+          Written By: Anupam Hore
+          Version: 1.0
+          Revisions: None
+        """
+        try:
+            path = self.model_directory + filename + "/" + filename + '.json'
+            if not os.path.isfile(path):
+                return {}
+            with open(path, 'r') as f:
+                return json.load(f)
+
+        except Exception as e:
+            self.logger.log(self.file_object, 'load_metadata Error: %s' % Exception(e))
+            raise Exception(e)
 
+    def save_preprocessor(self, preprocessor, filename):
+        """
+          Method Name: save_preprocessor
+          Description:This class saves the fitted preprocessor of the model next to the model, the
+                      statistics are saved as numpy arrays
+          Parameter: preprocessor(FittedPreprocessor), filename(name of the model)
+          Output: None
+          Written By: Anupam Hore
+          Version: 1.0
+          Revisions: None
+        """
+        self.logger.log(self.file_object, 'save_preprocessor Started!!!')
+        try:
+            path = os.path.join(self.model_directory, filename)
+            np.savez(path + "/" + filename + '_preprocessor.npz', **preprocessor.to_arrays())
+
+            self.logger.log(self.file_object, 'save_preprocessor Completed!!!')
+            return 'success'
+
+        except Exception as e:
+            self.logger.log(self.file_object, 'save_preprocessor Error: %s' % Exception(e))
+            raise Exception(e)
+
+    def load_preprocessor(self, filename):
+        """
+          Method Name: load_preprocessor
+          Description:This class loads the fitted preprocessor saved with the model
+          Output: FittedPreprocessor, None when the model has no preprocessor
+          Written By: Anupam Hore
+          Version: 1.0
+          Revisions: None
+        """
+        try:
+            path = self.model_directory + filename + "/" + filename + '_preprocessor.npz'
+            if not os.path.isfile(path):
+                return None
+            with np.load(path) as arrays:
+                return FittedPreprocessor.from_arrays(arrays)
+
+        except Exception as e:
+            self.logger.log(self.file_object, 'load_preprocessor Error: %s' % Exception(e))
+            raise Exception(e)
+
+    def list_models(self):
+        """
+          Method Name: list_models
+          Description:This class lists the models saved in the model directory, the model saved
+                      last first
+          Output: list of the names of the models
+          Written By: Anupam Hore
+          Version: 1.0
+          Revisions: None
+        """
+        try:
+            models = []
+            if os.path.isdir(self.model_directory):
+                for name in os.listdir(self.model_directory):
+                    path = os.path.join(self.model_directory, name, name + '.sav')
+                    if os.path.isfile(path):
+                        models.append((os.path.getmtime(path), name))
+            return [name for _, name in sorted(models, reverse=True)]
+
+        except Exception as e:
+            self.logger.log(self.file_object, 'list_models Error: %s' % Exception(e))
+            raise Exception(e)
+
+    def find_latest_model(self):
+        """
+          Method Name: find_latest_model
+          Description:This class finds out the model which was saved last in the model directory
+          Output: name of the model, None when no model is saved
+          Written By: Anupam Hore
+          Version: 1.1
+          Revisions: Uses list_models
+        """
+        models = self.list_models()
+        return models[0] if len(models) > 0 else None
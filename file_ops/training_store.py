@@ -0,0 +1,273 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+class Training_Store:
+    """
+        This class shall be used to save and load the master training data in a columnar
+        binary format instead of the master csv file.
+
+        The store is a directory with these files:
+            features.npy   - float32 feature matrix saved in column major (fortran) order so
+                             that every column is contiguous on the disk
+            labels.npy     - integer codes of the label
+            schema.json    - feature column names, label name, label categories, row count and
+                             the column types inferred by the training
+            recordings.csv - metadata of every recording (raw file) with its number of rows
+                             and its first row, when the files were validated
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+    """
+    def __init__(self, file_object, logger, store_directory=os.path.join('Training_Data', 'Input')):
+        self.logger = logger
+        self.file_object = file_object
+        self.store_directory = store_directory
+
+    def exists(self):
+        """
+        Method Name: exists
+        Description: This function checks if the store has been written
+        Output: True or False
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        return os.path.isfile(os.path.join(self.store_directory, 'schema.json'))
+
+    def save(self, df, labelName='Label', recordings=None):
+        """
+        Method Name: save
+        Description: This function saves the dataframe to the store. The feature columns are
+                     written as one float32 block and the label as categorical codes. All the
+                     files are written to a temporary directory next to the store, which then
+                     replaces the store directory. A reader sees the files of the old store or
+                     of the new store, never a mix of both (between the two renames of the swap
+                     the store does not exist for an instant)
+        Parameter: df(the master dataframe), labelName(the target variable name),
+                   recordings(recording metadata table in the order of the rows)
+        Output: None
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: The whole store is swapped in at once
+        """
+        self.logger.log(self.file_object, "Training_Store save Started!!!")
+        parent = os.path.dirname(os.path.abspath(self.store_directory))
+        os.makedirs(parent, exist_ok=True)
+        tmp_directory = tempfile.mkdtemp(prefix='tmp_store_', dir=parent)
+        try:
+            columns = [col for col in df.columns if col != labelName]
+            features = np.asfortranarray(df[columns].to_numpy(dtype=np.float32))
+
+            label = pd.Categorical(df[labelName])
+            codes = label.codes.astype(np.int8 if len(label.categories) < 128 else np.int16)
+
+            schema = {'columns': columns,
+                      'dtype': 'float32',
+                      'label': labelName,
+                      'categories': [str(category) for category in label.categories],
+                      'rows': int(features.shape[0])}
+
+            np.save(os.path.join(tmp_directory, 'features.npy'), features)
+            np.save(os.path.join(tmp_directory, 'labels.npy'), codes)
+            with open(os.path.join(tmp_directory, 'schema.json'), 'w') as f:
+                json.dump(schema, f, indent=1)
+            # without recordings the store has no metadata, the old one does not describe the new rows
+            if recordings is not None:
+                recordings.to_csv(os.path.join(tmp_directory, 'recordings.csv'), index=False)
+
+            # swap the directories, the old store is deleted after the new one is in place
+            old_directory = None
+            if os.path.isdir(self.store_directory):
+                old_directory = tmp_directory + '_old'
+                os.rename(self.store_directory, old_directory)
+            os.rename(tmp_directory, self.store_directory)
+            if old_directory is not None:
+                shutil.rmtree(old_directory, ignore_errors=True)
+
+            self.logger.log(self.file_object, "Training_Store saved %s rows and %s columns" % (schema['rows'], len(columns)))
+
+        except Exception as e:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            self.logger.log(self.file_object, "Training_Store save Error: %s" % Exception(e))
+            raise Exception(e)
+
+    def load_schema(self):
+        """
+        Method Name: load_schema
+        Description: This function loads the schema of the store
+        Output: Dictionary of the schema
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        with open(os.path.join(self.store_directory, 'schema.json'), 'r') as f:
+            return json.load(f)
+
+    def save_column_types(self, column_types):
+        """
+        Method Name: save_column_types
+        Description: This function saves the column types inferred on the training data in the
+                     schema, so that the next trainings on the same store do not infer them again.
+                     The types are removed when the store is saved again
+        Parameter: column_types(Dictionary of the column types)
+        Output: None
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        try:
+            schema = self.load_schema()
+            schema['column_types'] = column_types
+
+            tmp_path = os.path.join(self.store_directory, 'tmp_schema.json')
+            with open(tmp_path, 'w') as f:
+                json.dump(schema, f, indent=1)
+            os.replace(tmp_path, os.path.join(self.store_directory, 'schema.json'))
+
+        except Exception as e:
+            self.logger.log(self.file_object, "Training_Store save_column_types Error: %s" % Exception(e))
+            raise Exception(e)
+
+    def load_recordings(self):
+        """
+        Method Name: load_recordings
+        Description: This function loads the recording metadata table of the store
+        Output: Dataframe of the recording metadata, None when the store has no metadata
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        recordingsPath = os.path.join(self.store_directory, 'recordings.csv')
+        if not os.path.isfile(recordingsPath):
+            return None
+        return pd.read_csv(recordingsPath, dtype={'path': str, 'label': str, 'task': str, 'frequency': np.int32,
+                                                  'clock': np.int32, 'duration': np.int32, 'columns': str,
+                                                  'expected_rows': np.int64, 'rows': np.int64, 'offset': np.int64})
+
+    def load_arrays(self, columns=None, mmap_mode='r'):
+        """
+        Method Name: load_arrays
+        Description: This function loads the feature matrix and the label codes. The files are
+                     memory mapped, so only the pages of the projected columns are read
+        Parameter: columns(list of feature columns to load, None loads all of them),
+                   mmap_mode(numpy memory map mode, None reads the files into memory)
+        Output: feature matrix, label codes, feature column names, label categories
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        self.logger.log(self.file_object, "Training_Store load_arrays Started!!!")
+        try:
+            schema = self.load_schema()
+            features = np.load(os.path.join(self.store_directory, 'features.npy'), mmap_mode=mmap_mode)
+            codes = np.load(os.path.join(self.store_directory, 'labels.npy'), mmap_mode=mmap_mode)
+
+            if columns is not None:
+                positions = [schema['columns'].index(col) for col in columns]
+                if positions != list(range(len(schema['columns']))):
+                    # every column is contiguous, so this touches only the projected columns
+                    features = features[:, positions]
+            else:
+                columns = schema['columns']
+
+            self.logger.log(self.file_object, "Training_Store load_arrays Completed!!!")
+            return features, codes, list(columns), schema['categories']
+
+        except Exception as e:
+            self.logger.log(self.file_object, "Training_Store load_arrays Error: %s" % Exception(e))
+            raise Exception(e)
+
+    def iter_chunks(self, block_size, blocks_per_chunk=1, blocks=None, columns=None):
+        """
+        Method Name: iter_chunks
+        Description: This function reads the store chunk by chunk from the memory mapped files,
+                     so the memory used depends on the chunk size and not on the size of the
+                     store. The rows are divided in blocks of block_size rows and every chunk
+                     joins blocks_per_chunk blocks, in the order given by blocks. Passing the
+                     blocks in a random order mixes rows of different recordings in a chunk
+        Parameter: block_size(rows per block), blocks_per_chunk(blocks per chunk),
+                   blocks(block numbers to read, None reads all the blocks in order),
+                   columns(list of feature columns to load, None loads all of them)
+        Output: generator of feature chunk, label codes chunk
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        schema = self.load_schema()
+        features = np.load(os.path.join(self.store_directory, 'features.npy'), mmap_mode='r')
+        codes = np.load(os.path.join(self.store_directory, 'labels.npy'), mmap_mode='r')
+        if columns is None:
+            columns = schema['columns']
+        positions = [schema['columns'].index(col) for col in columns]
+
+        rows = schema['rows']
+        if blocks is None:
+            blocks = range((rows + block_size - 1) // block_size)
+        blocks = list(blocks)
+
+        for i in range(0, len(blocks), blocks_per_chunk):
+            slices = [slice(block * block_size, min((block + 1) * block_size, rows)) for block in blocks[i:i + blocks_per_chunk]]
+            X = np.concatenate([features[part, positions] for part in slices])
+            y = np.concatenate([codes[part] for part in slices])
+            yield X, y
+
+    def load_dataframe(self, columns=None, mmap_mode='r', dtype=None):
+        """
+        Method Name: load_dataframe
+        Description: This function loads the store as a dataframe with float32 feature columns
+                     and a categorical label column
+        Parameter: columns(list of feature columns to load, None loads all of them),
+                   mmap_mode(numpy memory map mode, None reads the files into memory),
+                   dtype(dtype of the feature columns, None keeps float32)
+        Output: Dataframe of the training data
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: The feature columns can be loaded in another dtype
+        """
+        features, codes, columns, categories = self.load_arrays(columns, mmap_mode)
+        schema = self.load_schema()
+        df = pd.DataFrame(np.array(features, dtype=dtype), columns=columns)
+        df[schema['label']] = pd.Categorical.from_codes(np.asarray(codes), categories=categories)
+        return df
+
+    def export_csv(self, path):
+        """
+        Method Name: export_csv
+        Description: This function exports the store to a csv file
+        Parameter: path(the csv file)
+        Output: None
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        self.logger.log(self.file_object, "Training_Store export_csv Started!!!")
+        try:
+            self.load_dataframe().to_csv(path)
+            self.logger.log(self.file_object, "Training_Store export_csv Completed!!!")
+
+        except Exception as e:
+            self.logger.log(self.file_object, "Training_Store export_csv Error: %s" % Exception(e))
+            raise Exception(e)
@@ -1,9 +1,11 @@
 from flask import Flask, request, render_template
-from flask import Response
+from flask import Response, jsonify
 import os
 from flask_cors import CORS, cross_origin
 from trainingValidation import train_validation
 from trainingModel import TrainModel
+from training_jobs.job_queue import TrainingJobQueue
+from prediction_service.predictor import Predictor, MicroBatcher
 
 
 os.putenv('LANG','en_US.UTF-8')
@@ -12,6 +14,56 @@ os.putenv('LC_ALL','en_US.UTF-8')
 app = Flask(__name__)
 CORS(app)
 
+# the training pipelines run in the background, one at a time
+job_queue = TrainingJobQueue(max_workers=1)
+
+# the best model stays in memory and concurrent /predict requests are predicted in batches
+predictor = Predictor()
+batcher = MicroBatcher(predictor.predict_proba, max_batch_size=256, max_wait=0.002)
+
+
+def runTrainingPipeline(params, progress):
+    """
+    Function Name: runTrainingPipeline
+    Description: This function runs the validation and the training of a /train job on the
+                 worker of the job queue
+    Parameter: params(the job parameters), progress(function called with every new stage)
+    Output: Dictionary with the name of the best model
+    On Failure: Exception
+
+    Written By: Anupam Hore
+    Version: 1.5
+    Revisions: Passes the parallel and the incremental ingestion modes. Reports the served model.
+               Passes the cross validation and the regularization path. Out of core training.
+               The served model is not reloaded after a training of window features
+    """
+    # clean, merge the csv files. The out of core training reads the training store, so it is
+    # always written in that mode
+    progress('validation')
+    train_val_obj = train_validation()
+    master_df = train_val_obj.startValidation(parallel=params['parallel'], incremental=params['incremental'],
+                                              persist=params['persist'] or params['out_of_core'])
+
+    trainingModelObj = TrainModel()
+    if params['out_of_core']:
+        # train chunk by chunk from the training store, the master dataframe is not kept
+        master_df = None
+        progress('out_of_core_training')
+        best_model_name = trainingModelObj.modelTrainingOutOfCore(chunk_size=params['chunk_size'])
+    else:
+        # start training on the master dataframe in memory
+        best_model_name = trainingModelObj.modelTraining(master_df, progress, train_val_obj.recordingsTable,
+                                                         params['window'], params['compact'], params['retrain'],
+                                                         params['cv'], params['path'])
+
+    # serve the new model from the next /predict request on. A model of window features can not
+    # predict single readings, the served model does not change (None when no model is served yet)
+    if params['window'] is None or params['out_of_core']:
+        served_model = predictor.reload()
+    else:
+        served_model = predictor.model_name
+    return {'model': best_model_name, 'served_model': served_model}
+
 @app.route("/", methods=['GET'])
 @cross_origin()
 def home():
@@ -25,13 +77,39 @@ def trainRouteClient():
         if request.json['filepath'] is not None:
             path = request.json['filepath']
 
-            # clean, merge the csv files
-             train_val_obj = train_validation()
-             train_val_obj.startValidation()
+            # the intermediate files are written only when persistence is requested
+            persist = request.json.get('persist', False)
+
+            # clean the raw files on a process pool, and only the files changed since the last run
+            parallel = request.json.get('parallel', False)
+            incremental = request.json.get('incremental', False)
+
+            # window, stride and aggregations of the window features, the readings are used when not given
+            window = request.json.get('window', None)
+
+            # float32 features and int8 label through the training
+            compact = request.json.get('compact', False)
 
-            # start training
-            trainingModelObj = TrainModel()
-            trainingModelObj.modelTraining()
+            # train the saved model again from its coefficients instead of searching a new one
+            retrain = request.json.get('retrain', False)
+
+            # number of folds to choose the best model with cross validation, and tuning of C along
+            # the regularization path, instead of the successive halving search
+            cv = request.json.get('cv', None)
+            regularization_path = request.json.get('path', False)
+
+            # train from the training store chunk by chunk of chunk_size rows, for the data which does
+            # not fit in the memory. The options of the model search above are not used in this mode
+            out_of_core = request.json.get('out_of_core', False)
+            chunk_size = request.json.get('chunk_size', 100000)
+
+            # queue the pipeline and return the job id right away
+            job_id = job_queue.submit({'filepath': path, 'persist': persist, 'parallel': parallel,
+                                       'incremental': incremental, 'window': window, 'compact': compact,
+                                       'retrain': retrain, 'cv': cv, 'path': regularization_path,
+                                       'out_of_core': out_of_core, 'chunk_size': chunk_size},
+                                      runTrainingPipeline)
+            return jsonify(job_queue.status(job_id)), 202
 
 
 
@@ -46,6 +124,35 @@ def trainRouteClient():
 
     return Response("Training Successfull!!")
 
+@app.route("/train/<job_id>", methods=['GET'])
+@cross_origin()
+def trainStatusClient(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return Response("Job %s not found" % job_id, status=404)
+    return jsonify(status)
+
+@app.route("/predict", methods=['POST'])
+@cross_origin()
+def predictRouteClient():
+
+    try:
+        # one reading or a list of readings, as dictionaries of the features or lists of values
+        X = predictor.toArray(request.json['data'])
+        proba, classes = batcher.submit(X).result()
+        predictions = [classes[i] for i in proba.argmax(axis=1)]
+        return jsonify({'model': predictor.model_name,
+                        'predictions': predictions,
+                        'probabilities': [dict(zip(classes, row)) for row in proba.tolist()]})
+
+    except ValueError as e:
+        return Response("Error Occurred! %s" % e, status=400)
+
+    except KeyError as e:
+        return Response("Error Occurred! %s" % e, status=400)
+
+    except Exception as e:
+        return Response("Error Occurred! %s" % e, status=500)
 
 
 
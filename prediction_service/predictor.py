@@ -0,0 +1,216 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+from app_logging.logger import appLogger
+from file_ops.file_methods import File_Operation
+from data_preprocessing.preprocessing import Preprocessor
+
+class Predictor:
+    """
+        This class shall be used to keep the best model resident in memory and predict the
+        activity of the RSS readings with it.
+
+        The model saved last by File_Operation is loaded once, with the features it was trained
+        on and the fitted preprocessor of the training data, and is kept until reload is called
+        (after a new training). The readings are given in the columns of the preprocessor, which
+        treats them like the training data and gives the features of the model.
+        The models trained on the window features of the recordings (the windowing of their
+        metadata) need whole recordings and can not predict single readings, they are not
+        served and the model of the readings saved last is loaded instead.
+
+        Written By: Anupam Hore
+        Version: 1.2
+        Revisions: Treats the readings with the fitted preprocessor of the model. The models of
+                   window features are not served
+    """
+    def __init__(self):
+        self.logger = appLogger()
+        self.file_object = open("Training_Logs/Prediction.txt", 'a+')
+        self.lock = threading.Lock()
+        self.model = None
+        self.model_name = None
+        self.features = None
+        self.columns = None
+        self.transform = None
+        self.labels = {number: name for name, number in Preprocessor.target_mapping.items()}
+
+    def reload(self):
+        """
+        Method Name: reload
+        Description: This function loads the model of the readings saved last, its features and
+                     its preprocessor. The models of window features are skipped
+        Output: name of the model
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.2
+        Revisions: Loads the fitted preprocessor. Skips the models of window features
+        """
+        self.logger.log(self.file_object, "Predictor reload Started!!!")
+        try:
+            file_op = File_Operation(self.logger)
+            model_name = None
+            for name in file_op.list_models():
+                metadata = file_op.load_metadata(name)
+                if metadata.get('windowing') is None:
+                    model_name = name
+                    break
+                self.logger.log(self.file_object, "Predictor skipped %s, it was trained on window features %s"
+                                % (name, metadata['windowing']))
+            if model_name is None:
+                raise Exception("No trained model of the readings in %s" % file_op.model_directory)
+
+            model = file_op.load_model(model_name)
+            features = metadata.get('features')
+            if features is None and hasattr(model, 'feature_names_in_'):
+                features = list(model.feature_names_in_)
+
+            # models saved without a preprocessor are given the features as they are
+            preprocessor = file_op.load_preprocessor(model_name)
+            columns = preprocessor.columns if preprocessor is not None else features
+            treat = preprocessor.transform if preprocessor is not None else (lambda X: X)
+
+            if hasattr(model, 'feature_names_in_'):
+                transform = lambda X: pd.DataFrame(treat(X), columns=features)
+            else:
+                transform = treat
+
+            with self.lock:
+                self.model = model
+                self.model_name = model_name
+                self.features = features
+                self.columns = columns
+                self.transform = transform
+
+            self.logger.log(self.file_object, "Predictor loaded %s with features %s" % (model_name, features))
+            return model_name
+
+        except Exception as e:
+            self.logger.log(self.file_object, "Predictor reload Error: %s" % Exception(e))
+            raise Exception(e)
+
+    def toArray(self, rows):
+        """
+        Method Name: toArray
+        Description: This function converts the readings of a request to a float array in the
+                     order of the input columns. A reading is a dictionary of column values or
+                     a list of values already in the order of the columns, and a request is
+                     one reading or a list of readings
+        Parameter: rows(the readings)
+        Output: 2d float array
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.1
+        Revisions: The readings are given in the columns of the preprocessor
+        """
+        if self.model is None:
+            self.reload()
+        if isinstance(rows, dict) or (len(rows) > 0 and not isinstance(rows[0], (list, dict))):
+            rows = [rows]
+        if len(rows) > 0 and isinstance(rows[0], dict):
+            rows = [[row[col] for col in self.columns] for row in rows]
+
+        X = np.asarray(rows, dtype=np.float64)
+        if X.ndim != 2 or (self.columns is not None and X.shape[1] != len(self.columns)):
+            raise ValueError("Expected readings of the columns %s" % self.columns)
+        return X
+
+    def predict_proba(self, X):
+        """
+        Method Name: predict_proba
+        Description: This function predicts the class probabilities of a batch of readings
+                     with one vectorized call of the model
+        Parameter: X(2d float array of the readings)
+        Output: 2d array of probabilities, activity name of every column
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        with self.lock:
+            model = self.model
+            transform = self.transform
+        proba = model.predict_proba(transform(X))
+        return proba, [self.labels.get(number, str(number)) for number in model.classes_]
+
+
+class MicroBatcher:
+    """
+        This class shall be used to serve many concurrent prediction requests with few model
+        calls. The requests are put in a queue and a background thread joins the waiting
+        requests into one batch, until max_batch_size rows are collected or max_wait seconds
+        have passed since the first request of the batch. Every batch is predicted with one
+        vectorized call and the rows of the result are handed back to their requests.
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+    """
+    def __init__(self, predict_fn, max_batch_size=256, max_wait=0.002):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, X):
+        """
+        Method Name: submit
+        Description: This function puts the readings of a request in the queue
+        Parameter: X(2d float array of the readings)
+        Output: Future of the prediction of the readings
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        future = Future()
+        self.requests.put((X, future))
+        return future
+
+    def run(self):
+        """
+        Method Name: run
+        Description: This function is the loop of the background thread which collects the
+                     requests into batches and predicts them
+        Output: None
+        On Failure: The error is set on the futures of the batch
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        while True:
+            batch = [self.requests.get()]
+            rows = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while rows < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                rows = rows + len(item[0])
+
+            try:
+                X = batch[0][0] if len(batch) == 1 else np.concatenate([item[0] for item in batch])
+                proba, classes = self.predict_fn(X)
+                offset = 0
+                for X_request, future in batch:
+                    future.set_result((proba[offset:offset + len(X_request)], classes))
+                    offset = offset + len(X_request)
+
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
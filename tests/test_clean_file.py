@@ -0,0 +1,55 @@
+import io
+
+import pandas as pd
+
+from trainingValidation import cleanFile, parseRecordingHeader, RECORDING_COLUMNS
+
+RAW = (
+    "# Task: cycling\n"
+    "# Frequency (Hz): 20\n"
+    "# Clock (millisecond): 250\n"
+    "# Duration (seconds): 120\n"
+    "# Columns: time,avg_rss12,var_rss12,avg_rss13,var_rss13,avg_rss23,var_rss23\n"
+    "0,39.25,0.43,22.75,0.43,33.75,1.30\n"
+    "250 39.25 0.43 23.00 0.00 33.00 0.00\n"
+    "\n"
+    "500,39.00,0.00,23.00,0.00,33.00,0.00,,\n"
+)
+
+
+def write_raw(tmp_path):
+    raw_path = tmp_path / "dataset1.csv"
+    raw_path.write_text(RAW)
+    return str(raw_path)
+
+
+def test_clean_file_normalizes_the_delimiters(tmp_path):
+    clean_path = str(tmp_path / "clean.csv")
+    cleanFile(write_raw(tmp_path), clean_path)
+
+    with open(clean_path) as f:
+        lines = f.read().splitlines()
+    assert lines == ["# Columns: time,avg_rss12,var_rss12,avg_rss13,var_rss13,avg_rss23,var_rss23",
+                     "0,39.25,0.43,22.75,0.43,33.75,1.30",
+                     "250,39.25,0.43,23.00,0.00,33.00,0.00",
+                     "500,39.00,0.00,23.00,0.00,33.00,0.00"]
+
+
+def test_clean_file_keeps_every_row(tmp_path):
+    buffer = io.StringIO()
+    cleanFile(write_raw(tmp_path), buffer)
+    buffer.seek(0)
+
+    df = pd.read_csv(buffer, skiprows=1, header=None, names=RECORDING_COLUMNS, on_bad_lines='error')
+    assert df.shape == (3, len(RECORDING_COLUMNS))
+    assert df['time'].tolist() == [0, 250, 500]
+
+
+def test_clean_file_parses_the_header(tmp_path):
+    header = cleanFile(write_raw(tmp_path), io.StringIO())
+
+    assert header['Task'] == 'cycling'
+    recording = parseRecordingHeader(header)
+    assert recording['task'] == 'cycling'
+    assert recording['columns'] == RECORDING_COLUMNS
+    assert recording['expected_rows'] == 480
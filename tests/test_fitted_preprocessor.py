@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app_logging.logger import appLogger
+from data_preprocessing.fitted_preprocessor import FittedPreprocessor
+from file_ops.file_methods import File_Operation
+
+
+def make_preprocessor():
+    return FittedPreprocessor(['a', 'b', 'c'], zero_values=[1.0, 2.0, 3.0], fill_values=[10.0, 20.0, 30.0],
+                              lower=[-np.inf, 0.0, -5.0], upper=[np.inf, 100.0, 5.0], features=['c', 'a'])
+
+
+def assert_same(loaded, preprocessor):
+    assert loaded.columns == preprocessor.columns
+    assert loaded.features == preprocessor.features
+    for name in ['zero_values', 'fill_values', 'lower', 'upper']:
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(preprocessor, name))
+
+
+def test_transform():
+    X = np.array([[0.0, np.nan, 7.0],
+                  [4.0, 200.0, 0.0]])
+
+    np.testing.assert_array_equal(make_preprocessor().transform(X), [[5.0, 1.0],
+                                                                     [3.0, 4.0]])
+
+
+def test_arrays_round_trip():
+    preprocessor = make_preprocessor()
+    loaded = FittedPreprocessor.from_arrays(preprocessor.to_arrays())
+
+    assert_same(loaded, preprocessor)
+
+
+@pytest.fixture
+def file_op(tmp_path, monkeypatch):
+    # File_Operation writes its log and the models relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'Training_Logs').mkdir()
+    (tmp_path / 'models' / 'model').mkdir(parents=True)
+    file_op = File_Operation(appLogger())
+    yield file_op
+    file_op.file_object.close()
+
+
+def test_save_load_round_trip(file_op):
+    preprocessor = make_preprocessor()
+    file_op.save_preprocessor(preprocessor, 'model')
+    loaded = file_op.load_preprocessor('model')
+
+    assert_same(loaded, preprocessor)
+    X = np.array([[0.0, np.nan, 7.0], [4.0, 200.0, 0.0]])
+    np.testing.assert_array_equal(loaded.transform(X), preprocessor.transform(X))
+
+
+def test_load_without_preprocessor(file_op):
+    assert file_op.load_preprocessor('model') is None
@@ -1,12 +1,19 @@
 import pandas as pd
+import numpy as np
 from app_logging.logger import appLogger
 from data_preprocessing.preprocessing import Preprocessor
+from data_preprocessing.streaming_stats import StreamingStatistics
+from data_preprocessing.windowing import WindowFeatures
+from data_preprocessing.fitted_preprocessor import FittedPreprocessor
 import os
 from sys import platform
 from feature_selection.featureSelection import FeatureSelection
 from sklearn.model_selection import train_test_split
 from best_model_finder.tuner import Model_Finder
 from file_ops.file_methods import File_Operation
+from file_ops.training_store import Training_Store
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
 
 class TrainModel:
     def __init__(self):
@@ -14,85 +21,158 @@ class TrainModel:
         self.file_object = open("Training_Logs/TrainingLog.txt", 'a+')
         pass
 
-    def modelTraining(self):
+    def modelTraining(self, df=None, progress=None, recordings=None, windowing=None, compact=False, retrain=False,
+                      cv=None, path=False):
         """
         Method Name: modelTraining
         Description:This class trains the dataset after doing all the preprocessing
-        Output: None
+        Parameter: df(the master dataframe handed over by train_validation in the in memory
+                   mode. When it is not given the data is read from the training store),
+                   progress(function called with the name of every stage which is started),
+                   recordings(recording metadata table of the rows of df),
+                   windowing(Dictionary with window, stride and aggregations of WindowFeatures.
+                   When it is given the model is trained on the window features of every
+                   recording instead of the single readings),
+                   compact(keep the features as one float32 block and the label as int8 numbers
+                   through the preprocessing and the feature selection, without copies of the
+                   whole dataframe),
+                   retrain(train the model saved last again, starting from its coefficients,
+                   instead of searching for the best model. The best model is searched when no
+                   model is saved),
+                   cv(number of folds to choose the best model with cross validation, None for
+                   no cross validation), path(tune C along the regularization path)
+        Output: name of the best model, with ' window' at the end for the window features
         Written By: Anupam Hore
-        Version: 1.0
-        Revisions: None
+        Version: 2.5
+        Revisions: Accepts the master dataframe in memory. Reports the stage progress.
+                   Trains on sliding window features. The preprocessing statistics are fitted
+                   once and saved with the model. Declarative outlier rules. The inferred column
+                   types are kept in the training store. The feature selection results are cached.
+                   Compact memory layout. Retrains the saved model. Saves the training report.
+                   Saves the windowing with the model. Cross validation and regularization path.
+                   Keeps the zeros of the std and the slope window features. The column types are
+                   saved with the model. Only the feature columns are read from the store
         """
         self.logger.log(self.file_object,"Start of Training!!!")
+        if progress is None:
+            progress = lambda stage: None
+        best_model_name = None
         separator = "\\"
         if platform == 'darwin':  # mac system
             separator = "/"
 
         try:
-            #get the data
-            self.df = pd.read_csv('Training_Data/Input.csv')
+            #get the data from the training store, the master csv file is read only when there is no store
+            store = Training_Store(self.file_object, self.logger)
+            file_op = File_Operation(self.logger)
+            column_types = None
+            if df is not None:
+                self.df = df
+            elif store.exists():
+                schema = store.load_schema()
+                # only the columns of the features are read from the store, the time and the index are not
+                self.df = store.load_dataframe([col for col in schema['columns'] if col not in ['Unnamed: 0', '# Columns: time']])
+                recordings = store.load_recordings()
+                # the column types inferred by the last training on the store
+                column_types = schema.get('column_types', {})
+            else:
+                self.df = pd.read_csv('Training_Data/Input.csv')
+
+            # replace the readings with the features of the sliding windows of every recording
+            keep_zeros = None
+            if windowing is not None:
+                progress('windowing')
+                windowFeatures = WindowFeatures(self.file_object, self.logger, **windowing)
+                self.df = windowFeatures.transform(self.df, recordings, 'Label')
+                # the std and the slope of a constant window are 0, those zeros are not missing readings
+                keep_zeros = windowFeatures.zeroValuedFeatures(self.df.columns)
 
             # initiate the preprocessor class
+            progress('preprocessing')
             preprocessor = Preprocessor(self.file_object, self.logger)
 
-            # map the target variables name to the numerical numbers(since model will expect numbers)
-            preprocessor.map_target_variable(self.df,'Label')
-
-            self.logger.log(self.file_object, "Mapped Variable: %s"%self.df['Label'].value_counts())
-
-            # separate the dependant and independant variables
-
-            X, Y = preprocessor.separate_label_features(self.df, 'Label')
-
-            # find out if 0 are present in the dataset. Change them to their mean()
-            X = preprocessor.imputeZeros(X)
-
-
-            #find if any missing value present in the data
-            isnullpresent, missingValueColumns = preprocessor.is_null_present(X)
-
-
-            #impute missing values
-            if isnullpresent:
-                X = preprocessor.impute_missingValues(X,missingValueColumns)
-
             # initial columns to drop
-            cols_to_drop = ['Unnamed: 0', '# Columns: time']
-            X = preprocessor.dropVariables(X, cols_to_drop, 1, True)
-
-            #outlier treatment
-            cols_needing_outlierTreatment = ['avg_rss12','var_rss12','avg_rss13','var_rss13','avg_rss23','var_rss23']
-            distributionTypes =['Skewed','Highly Skewed','Gaussian','Highly Skewed','Gaussian','Skewed']
-
-            isLengthSame, X = preprocessor.outlier_treatment(X, cols_needing_outlierTreatment,distributionTypes)
-
-            if isLengthSame:
-
-                # Separate the categorical and continous variables from the input variables for processing
-                cagtegoricalVars, numericalVars = preprocessor.separate_cat_num(X)
-
-                self.logger.log(self.file_object, "Categorical Variables: {}".format(cagtegoricalVars))
-                self.logger.log(self.file_object, "Numerical Variables: {}".format(numericalVars))
-
-
+            cols_to_drop = [col for col in ['Unnamed: 0', '# Columns: time'] if col in self.df.columns]
+
+            if compact:
+                # one float32 block of the features and the int8 mapped target variable
+                values, columns, Y = preprocessor.compact_split(self.df, 'Label', cols_to_drop)
+
+                # the master dataframe is not needed any more
+                self.df = None
+                df = None
+            else:
+                # map the target variables name to the numerical numbers(since model will expect numbers)
+                preprocessor.map_target_variable(self.df,'Label')
+
+                self.logger.log(self.file_object, "Mapped Variable: %s"%self.df['Label'].value_counts())
+
+                # separate the dependant and independant variables
+
+                X, Y = preprocessor.separate_label_features(self.df, 'Label')
+                X = preprocessor.dropVariables(X, cols_to_drop, 1, True)
+                columns = list(X.columns)
+
+            #outlier treatment, the window features have their own names, the readings are treated only when present
+            outlier_rules = {col: dist for col, dist in preprocessor.outlier_rules.items() if col in columns}
+
+            # learn the zero, missing value and outlier statistics once, they are saved with the model.
+            # The 0 are changed to their mean(), the missing values imputed and the outliers clipped
+            # in the same pass
+            if compact:
+                # the block is imputed and clipped in place
+                pipeline = preprocessor.fit_block(values, columns, outlier_rules, clip=True, keep_zeros=keep_zeros)
+                X = pd.DataFrame(values, columns=columns, copy=False)
+            else:
+                pipeline, X = preprocessor.fit_pipeline(X, outlier_rules, keep_zeros)
+
+            # Separate the categorical and continous variables from the input variables for processing
+            # the types are inferred once, they are kept in the training store and saved with the model.
+            # Without the store they are taken from the saved models, the model saved last first
+            from_store = column_types is not None
+            if not from_store:
+                column_types = {}
+                for name in file_op.list_models():
+                    column_types = dict(file_op.load_metadata(name).get('column_types', {}), **column_types)
+            cached_types = len(column_types)
+            cagtegoricalVars, numericalVars = preprocessor.separate_cat_num(X, column_types)
+            self.logger.log(self.file_object, "Column Types: %s cached, %s inferred" % (cached_types, len(column_types) - cached_types))
+            if from_store and len(column_types) > cached_types:
+                store.save_column_types(column_types)
+
+            self.logger.log(self.file_object, "Categorical Variables: {}".format(cagtegoricalVars))
+            self.logger.log(self.file_object, "Numerical Variables: {}".format(numericalVars))
+
+
+            progress('feature_selection')
+
+            # perform feature selection
+            featureSelection = FeatureSelection(self.logger)
+
+            # the selection is taken from the cache when the data and the parameters did not change
+            selection_params = {'collinear_threshold': 0.7, 'best_features': 5, 'sample_size': 100000, 'random_state': 100}
+            fingerprint = featureSelection.fingerprint(X, Y, selection_params)
+            selection = featureSelection.loadCachedSelection(fingerprint)
+
+            if selection is None:
                 # check for multi-collinearity
-                high_collinear_vars = preprocessor.checkforMultiCollinearity(X, 0.7)
+                # the correlation matrix is calculated once for the screening of the collinear variables
+                corr = preprocessor.correlationMatrix(X)
+                high_collinear_vars = preprocessor.checkforMultiCollinearity(X, selection_params['collinear_threshold'], corr)
                 self.logger.log(self.file_object, "High Multi-Collinear Variables: {}".format(high_collinear_vars))
 
-                # perform feature selection
-                featureSelection = FeatureSelection(self.logger)
-
                 # find features whose VIF values are less than 10. Those features will be good for the model
-                features_with_low_vif = featureSelection.findVIF_Factor(X)
+                # the VIF are taken from the correlation matrix of the multi-collinearity check
+                features_with_low_vif = featureSelection.findVIF_Factor(X, corr)
                 self.logger.log(self.file_object, "Low VIF Variables: {}".format(features_with_low_vif))
 
                 # find constant features
                 const_features = featureSelection.findConstantFeatures(X)
-                # we will drop the constant features
-                if len(const_features) > 0:
-                    X.drop(const_features, axis=1, inplace=True)
 
-                best_features = featureSelection.findbestFeatures(X,Y)
+                best_features = featureSelection.findbestFeatures(X.drop(const_features, axis=1) if len(const_features) > 0 else X, Y,
+                                                                  selection_params['best_features'],
+                                                                  selection_params['sample_size'],
+                                                                  random_state=selection_params['random_state'])
                 self.logger.log(self.file_object, "Best Features: {}".format(best_features))
                 """
                 Feature Selection will be performed based on the following variables
@@ -104,34 +184,177 @@ class TrainModel:
                 # find out final features for model
                 X_features = featureSelection.findFinalFeatures(high_collinear_vars,best_features, features_with_low_vif)
 
-                self.logger.log(self.file_object, "Final Features before transformation: {}".format(X_features))
-
-                # replace the final features in the dataset from the feature selection process
-                X = featureSelection.updateDataSet(X, X_features)
-
-                self.logger.log(self.file_object, "Final Features after transformation: {}".format(X.columns))
-
-                # split the data
-                X_train, X_test, y_train, y_test = train_test_split(X, Y, test_size=0.30,
-                                                                    random_state=100)
-
-                model_finder = Model_Finder(self.logger)
-
+                selection = {'high_collinear_vars': high_collinear_vars,
+                             'features_with_low_vif': features_with_low_vif,
+                             'const_features': const_features,
+                             'best_features': best_features,
+                             'final_features': X_features}
+                featureSelection.saveCachedSelection(fingerprint, selection)
+
+            # we will drop the constant features
+            if len(selection['const_features']) > 0:
+                X.drop(selection['const_features'], axis=1, inplace=True)
+
+            X_features = selection['final_features']
+            self.logger.log(self.file_object, "Final Features before transformation: {}".format(X_features))
+
+            # replace the final features in the dataset from the feature selection process
+            X = featureSelection.updateDataSet(X, X_features)
+
+            self.logger.log(self.file_object, "Final Features after transformation: {}".format(X.columns))
+
+            # split the data
+            X_train, X_test, y_train, y_test = train_test_split(X, Y, test_size=0.30,
+                                                                random_state=100)
+
+            progress('model_selection')
+            model_finder = Model_Finder(self.logger)
+
+            # the model saved last of the same features, readings or window features
+            latest_model = None
+            if retrain:
+                for name in file_op.list_models():
+                    if file_op.load_metadata(name).get('windowing') == windowing:
+                        latest_model = name
+                        break
+            if latest_model is not None:
+                # the saved model is seeded with its coefficients, nightly data changes little
+                best_model_name, best_model = model_finder.retrain_model(X_train, y_train, X_test, y_test, latest_model)
+            else:
                 # getting the best model for each of the clusters
-                best_model_name, best_model = model_finder.get_best_model(X_train, y_train, X_test, y_test)
-
-                # save the best model to the directory
-                file_op = File_Operation(self.logger)
-                save_model = file_op.save_model(best_model, best_model_name)
+                best_model_name, best_model = model_finder.get_best_model(X_train, y_train, X_test, y_test,
+                                                                          path=path, cv=cv)
+                if windowing is not None:
+                    # the models of window features are saved next to the model of the readings
+                    best_model_name = best_model_name + ' window'
+
+            # save the best model to the directory
+            progress('saving_model')
+            # where the time of the model selection went, saved with the model
+            training_report = model_finder.trainingReport()
+            # a model of window features can not predict single readings, /predict does not serve it
+            save_model = file_op.save_model(best_model, best_model_name, {'features': list(X.columns),
+                                                                          'windowing': windowing,
+                                                                          'column_types': column_types,
+                                                                          'training_report': training_report})
+
+            # the readings are treated at prediction with the statistics of the training data
+            pipeline.select(list(X.columns))
+            file_op.save_preprocessor(pipeline, best_model_name)
 
 
             self.logger.log(self.file_object, "Training Successfull!!!")
+            return best_model_name
 
         except Exception as e:
             self.logger.log(self.file_object, "Training Failure: %s"%Exception(e))
             raise Exception(e)
 
+    def modelTrainingOutOfCore(self, chunk_size=100000, n_epochs=5, max_test_rows=200000):
+        """
+        Method Name: modelTrainingOutOfCore
+        Description:This class trains the model on the training store chunk by chunk, for the data
+                    which does not fit in the memory. The statistics are learned in the order of the
+                    stages of the in memory training, one pass over the chunks each: the first pass
+                    gives the imputation values of the raw data, the second the outlier bounds of
+                    the imputed data and the third the correlations and the scaling of the treated
+                    data, which the model is trained on. The next passes treat every chunk with
+                    those statistics and train a logistic regression with partial_fit. The memory
+                    used depends on chunk_size only.
+                    The rows are read in blocks of chunk_size/16 rows in a random order, so that
+                    every chunk has rows of many recordings and activities
+        Parameter: chunk_size(rows per chunk), n_epochs(passes over the training chunks),
+                   max_test_rows(maximum rows of the test blocks used for the model score)
+        Output: name of the model
+        Written By: Anupam Hore
+        Version: 1.2
+        Revisions: The outlier bounds are calculated on the imputed data and the scaler is fitted
+                   on the treated data. Returns the name of the model
+        """
+        self.logger.log(self.file_object,"Start of Out Of Core Training!!!")
+        try:
+            store = Training_Store(self.file_object, self.logger)
+            schema = store.load_schema()
+            columns = [col for col in schema['columns'] if col not in ['Unnamed: 0', '# Columns: time']]
 
+            preprocessor = Preprocessor(self.file_object, self.logger)
 
+            # split the blocks of the store in train and test blocks
+            blocks_per_chunk = 16
+            block_size = max(chunk_size // blocks_per_chunk, 1)
+            n_blocks = (schema['rows'] + block_size - 1) // block_size
+            rng = np.random.RandomState(100)
+            blocks = rng.permutation(n_blocks)
+            n_test = max(int(n_blocks * 0.30), 1)
+            test_blocks, train_blocks = blocks[:n_test], blocks[n_test:]
+
+            # first pass: imputation values of the raw training blocks
+            stats = StreamingStatistics(columns)
+            for X_chunk, _ in store.iter_chunks(block_size, blocks_per_chunk, train_blocks, columns):
+                stats.update(X_chunk)
+            self.logger.log(self.file_object, "Streaming Statistics Rows: %s" % stats.rows_seen)
+            means, medians = preprocessor.imputation_values(stats)
+
+            # second pass: outlier bounds of the imputed training blocks
+            no_bounds = np.full(len(columns), np.inf)
+            stats = StreamingStatistics(columns)
+            for X_chunk, _ in store.iter_chunks(block_size, blocks_per_chunk, train_blocks, columns):
+                stats.update(preprocessor.transform_chunk(X_chunk, means, medians, -no_bounds, no_bounds))
+            lower, upper = preprocessor.outlier_bounds(stats, preprocessor.outlier_rules)
+
+            # third pass: correlations and scaling of the treated training blocks
+            stats = StreamingStatistics(columns)
+            scaler = StandardScaler()
+            for X_chunk, _ in store.iter_chunks(block_size, blocks_per_chunk, train_blocks, columns):
+                X_chunk = preprocessor.transform_chunk(X_chunk, means, medians, lower, upper)
+                stats.update(X_chunk)
+                scaler.partial_fit(X_chunk)
+
+            # check for multi-collinearity, the high multi-collinear variables are not used
+            high_collinear_vars = preprocessor.findCollinearFromCorrelation(stats.correlation(), columns, 0.7)
+            self.logger.log(self.file_object, "High Multi-Collinear Variables: {}".format(high_collinear_vars))
+            selected = [i for i, col in enumerate(columns) if col not in high_collinear_vars]
+            X_features = [columns[i] for i in selected]
+            self.logger.log(self.file_object, "Final Features: {}".format(X_features))
+
+            scaler.mean_ = scaler.mean_[selected]
+            scaler.var_ = scaler.var_[selected]
+            scaler.scale_ = scaler.scale_[selected]
+            scaler.n_features_in_ = len(selected)
+
+            model_finder = Model_Finder(self.logger)
+            model = model_finder.get_incremental_logisticRegression()
+            classes = np.array(sorted(preprocessor.target_mapping.values()))
+
+            # next passes: treat every chunk with the statistics and train the model
+            for epoch in range(n_epochs):
+                for X_chunk, codes in store.iter_chunks(block_size, blocks_per_chunk, rng.permutation(train_blocks), columns):
+                    X_chunk = preprocessor.transform_chunk(X_chunk, means, medians, lower, upper)[:, selected]
+                    Y_chunk = preprocessor.map_target_codes(codes, schema['categories'])
+                    model.partial_fit(scaler.transform(X_chunk), Y_chunk, classes=classes)
+                self.logger.log(self.file_object, "Epoch %s Completed!!!" % (epoch + 1))
+
+            best_model = make_pipeline(scaler, model)
+
+            # score the model on the test blocks
+            test_rows = max(max_test_rows // block_size, 1)
+            X_test = []
+            y_test = []
+            for X_chunk, codes in store.iter_chunks(block_size, blocks_per_chunk, test_blocks[:test_rows], columns):
+                X_test.append(preprocessor.transform_chunk(X_chunk, means, medians, lower, upper)[:, selected])
+                y_test.append(preprocessor.map_target_codes(codes, schema['categories']))
+            score = model_finder.getModelScore(best_model, np.concatenate(X_test), np.concatenate(y_test))
+            self.logger.log(self.file_object, "Out Of Core Model Score: %s" % score)
+
+            # save the model to the directory
+            best_model_name = 'Logistic Regression sgd'
+            file_op = File_Operation(self.logger)
+            file_op.save_model(best_model, best_model_name, {'features': X_features})
+            file_op.save_preprocessor(FittedPreprocessor(columns, means, medians, lower, upper, X_features), best_model_name)
+
+            self.logger.log(self.file_object, "Out Of Core Training Successfull!!!")
+            return best_model_name
 
-
+        except Exception as e:
+            self.logger.log(self.file_object, "Out Of Core Training Failure: %s"%Exception(e))
+            raise Exception(e)
@@ -3,30 +3,219 @@ import os
 from os import listdir
 from glob import glob
 from app_logging.logger import appLogger
+from file_ops.training_store import Training_Store
 from sys import platform
-import csv
 import shutil
+import json
+import hashlib
+import io
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+RECORDING_COLUMNS = ['time', 'avg_rss12', 'var_rss12', 'avg_rss13', 'var_rss13', 'avg_rss23', 'var_rss23']
+
+
+def readRecordingHeader(raw_path):
+    """
+       Function Name: readRecordingHeader
+       Description: This function reads only the '#' metadata lines at the top of the raw file
+       Parameter: raw_path(the raw csv file)
+       Output: Dictionary of the '#' header entries of the raw file
+       On Failure: Raise Exception
+
+       Written By: Anupam Hore
+       Version: 1.0
+       Revisions: None
+    """
+    header = {}
+    with open(raw_path, 'r') as f:
+        for line in f:
+            if not line.startswith('#'):
+                break
+            key, _, value = line[1:].partition(':')
+            header[key.strip()] = value.strip()
+    return header
+
+
+def parseRecordingHeader(header):
+    """
+       Function Name: parseRecordingHeader
+       Description: This function converts the '#' header entries of a raw file into the typed
+                    metadata of the recording. The recording has one row every clock milliseconds
+                    for duration seconds, so it is expected to have duration * 1000 / clock rows
+       Parameter: header(Dictionary of the '#' header entries)
+       Output: Dictionary with task, frequency, clock, duration, columns and expected_rows
+       On Failure: Raise ValueError when an entry is missing, is not a positive number or the
+                   columns are not the expected columns
+
+       Written By: Anupam Hore
+       Version: 1.0
+       Revisions: None
+    """
+    required = ['Task', 'Frequency (Hz)', 'Clock (millisecond)', 'Duration (seconds)', 'Columns']
+    missing = [key for key in required if key not in header]
+    if len(missing) > 0:
+        raise ValueError("Missing header entries: %s" % missing)
+
+    try:
+        frequency = int(header['Frequency (Hz)'])
+        clock = int(header['Clock (millisecond)'])
+        duration = int(header['Duration (seconds)'])
+    except ValueError:
+        raise ValueError("Header entries are not numbers: %s" % header)
+    if frequency <= 0 or clock <= 0 or duration <= 0:
+        raise ValueError("Header entries are not positive: %s" % header)
+
+    columns = [col.strip() for col in header['Columns'].split(',')]
+    if columns != RECORDING_COLUMNS:
+        raise ValueError("Unexpected columns: %s" % columns)
+
+    return {'task': header['Task'],
+            'frequency': frequency,
+            'clock': clock,
+            'duration': duration,
+            'columns': columns,
+            'expected_rows': duration * 1000 // clock}
+
+
+def cleanFile(raw_path, clean_path):
+    """
+       Function Name: cleanFile
+       Description: This function reads the raw file only once and writes the cleaned file
+                    in the same pass. The '#' metadata lines are parsed into a dictionary,
+                    the '# Columns' line is kept as the header of the cleaned file and every
+                    data row is normalized to comma separated values. Some files have the
+                    entries separated by spaces instead of commas, those rows are split on
+                    the whitespace and joined again with ",". The trailing commas of a row
+                    (the last row of some cycling files) are removed, so the row is not
+                    dropped as a bad line.
+       Parameter: raw_path(the raw csv file), clean_path(the file to write the clean entries,
+                  or an open text buffer for the in memory mode)
+       Output: Dictionary of the '#' header entries of the raw file
+       On Failure: Raise Exception
+
+       Written By: Anupam Hore
+       Version: 1.2
+       Revisions: The clean entries can be written to a text buffer. Removes the trailing commas
+    """
+    if not isinstance(clean_path, str):
+        with open(raw_path, 'r') as src:
+            return writeCleanLines(src, clean_path)
+
+    with open(raw_path, 'r') as src, open(clean_path, 'w') as dst:
+        return writeCleanLines(src, dst)
+
+
+def writeCleanLines(src, dst):
+    """
+       Function Name: writeCleanLines
+       Description: This function does the cleaning of cleanFile, from the lines of the raw
+                    file to the clean file or buffer
+       Parameter: src(the open raw file), dst(the open clean file or text buffer)
+       Output: Dictionary of the '#' header entries of the raw file
+       On Failure: Raise Exception
+
+       Written By: Anupam Hore
+       Version: 1.1
+       Revisions: Removes the trailing commas of the rows
+    """
+    header = {}
+    for line in src:
+        if line.startswith('#'):
+            key, _, value = line[1:].partition(':')
+            header[key.strip()] = value.strip()
+            if key.strip() == 'Columns':
+                dst.write(line.rstrip() + '\n')
+            continue
+
+        line = line.strip()
+        if not line:
+            continue
+        if ',' not in line:
+            line = ','.join(line.split())
+        dst.write(line.rstrip(',') + '\n')
+    return header
+
+
+def cleanAndParseFile(raw_path, clean_path):
+    """
+       Function Name: cleanAndParseFile
+       Description: This function is the unit of work of the parallel ingestion. It cleans
+                    one raw file with cleanFile and reads the cleaned entries into a dataframe.
+                    It is kept at module level so that it can be sent to the worker processes.
+                    The files are validated before, so all the columns are read as float
+                    without letting pandas guess the types
+       Parameter: raw_path(the raw csv file), clean_path(the file to write the clean entries,
+                  None keeps the clean entries in memory and nothing is written)
+       Output: Dataframe of the cleaned file
+       On Failure: Raise Exception
+
+       Written By: Anupam Hore
+       Version: 1.1
+       Revisions: Added the in memory mode
+    """
+    if clean_path is None:
+        buffer = io.StringIO()
+        cleanFile(raw_path, buffer)
+        buffer.seek(0)
+        return pd.read_csv(buffer, on_bad_lines='skip', dtype=np.float64)
+
+    cleanFile(raw_path, clean_path)
+    return pd.read_csv(clean_path, on_bad_lines='skip', dtype=np.float64)
+
+
+def hashFile(path, block_size=1 << 20):
+    """
+       Function Name: hashFile
+       Description: This function calculates the sha256 content hash of the file. The file is
+                    read in blocks so that the memory used does not depend on the file size
+       Parameter: path(the file), block_size(number of bytes read at a time)
+       Output: hex digest of the file content
+       On Failure: Raise Exception
+
+       Written By: Anupam Hore
+       Version: 1.0
+       Revisions: None
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
 
 class train_validation:
     def __init__(self):
         self.logger = appLogger()
         self.file_path = open("Validation_Logs/ValidationLog.txt", 'a+')
+        self.export_csv = False
+        self.recordings = {}
+        self.recordingsTable = None
 
 
-    def startValidation(self):
+    def startValidation(self, parallel=False, n_workers=None, incremental=False, export_csv=False, persist=True):
         """
            Method Name: startValidation
            Description: This method will read all the csv files from the respective directory and
                         clean them, read them into dataframes, combine them and save the combined
                         file again to a master csv file which will be used for model training
-           Output: None
+           Parameter: parallel(clean and parse the files on a process pool),
+                      n_workers(number of worker processes, None uses all the cores),
+                      incremental(only process the files added or changed since the last run),
+                      export_csv(also write the master csv file next to the training store),
+                      persist(write the clean files and the training store. When it is False
+                      nothing is written and the master dataframe is only returned)
+           Output: The master dataframe
            On Failure: Raise ValueError,KeyError,Exception
 
            Written By: Anupam Hore
-           Version: 1.0
-           Revisions: None
+           Version: 1.5
+           Revisions: Added the parallel and the incremental ingestion modes. The master data
+                      is saved to the columnar training store. The files with bad headers are
+                      rejected before cleaning. Added the in memory mode
         """
         self.logger.log(self.file_path,"startValidation Started!!!")
+        self.export_csv = export_csv
         try:
             files = []
             start_dir = os.getcwd() + "\Raw_Data"
@@ -38,19 +227,114 @@ class train_validation:
             self.logger.log(self.file_path,"Total Files are:%s"%len(files))
             self.logger.log(self.file_path, "Files are:%s" %files)
 
-            # delete the extra entries in the csv files
-            self.cleanFiles(files)
+            # parse the recording metadata of the files and reject the files with bad headers
+            files = self.validateFiles(files)
+
+            if incremental:
+                # patch the master file with the files changed since the last run
+                master_df = self.incrementalValidation(files, parallel, n_workers, persist)
+            elif parallel or not persist:
+                if persist:
+                    # the master file is rebuilt, the manifest of the previous incremental run is stale
+                    self.removeManifest()
+
+                # clean and parse the files on the worker processes, or in this process
+                # when the files are only kept in memory
+                frames = self.cleanFilesParallel(files, n_workers if parallel else 1, persist)
+
+                # combine the parsed files for each directory and put the labels
+                master_df = self.combileFiles(frames, persist)
+            else:
+                self.removeManifest()
 
-            # combine the files for each directory and put the labels
-            self.combileFiles()
+                # delete the extra entries in the csv files
+                self.cleanFiles(files)
+
+                # combine the files for each directory and put the labels
+                master_df = self.combileFiles()
 
 
             self.logger.log(self.file_path,"startValidation Completed!!!")
+            return master_df
 
         except Exception as e:
             self.logger.log(self.file_path,"Validation Error: %s"%Exception(e))
             raise Exception(e)
 
+    def validateFiles(self, files):
+        """
+           Method Name: validateFiles
+           Description: This method reads the '#' header of every raw file and parses it into the
+                        typed recording metadata. The files with missing or bad header entries,
+                        unexpected columns or a task which is not the name of their directory
+                        are rejected before any cleaning is done
+           Parameter: files(the raw csv files)
+           Output: list of the valid files
+           On Failure: Raise Exception
+
+           Written By: Anupam Hore
+           Version: 1.0
+           Revisions: None
+        """
+        self.logger.log(self.file_path, "validateFiles Started!!!")
+        try:
+            self.recordings = {}
+            valid_files = []
+            for file in files:
+                try:
+                    metadata = parseRecordingHeader(readRecordingHeader(file))
+                    filedirectory, file_to_write_path = self.getCleanFilePath(file, create=False)
+                    if metadata['task'] != filedirectory:
+                        raise ValueError("Task %s is not the directory %s" % (metadata['task'], filedirectory))
+                except ValueError as e:
+                    self.logger.log(self.file_path, "Rejected File %s: %s" % (file, e))
+                    continue
+
+                metadata['path'] = os.path.relpath(file)
+                metadata['label'] = filedirectory
+                self.recordings[file_to_write_path] = metadata
+                valid_files.append(file)
+
+            self.logger.log(self.file_path, "Valid Files: %s of %s" % (len(valid_files), len(files)))
+            self.logger.log(self.file_path, "validateFiles Completed!!!")
+            return valid_files
+
+        except Exception as e:
+            self.logger.log(self.file_path, "File Validation Error: %s"%Exception(e))
+            raise Exception(e)
+
+    def buildRecordingsTable(self, clean_paths, frames):
+        """
+           Method Name: buildRecordingsTable
+           Description: This method builds the recording metadata table of the master data, one
+                        row for each file in the order of its rows in the master dataframe, with
+                        the number of rows and the first row of the recording
+           Parameter: clean_paths(the clean file of every dataframe), frames(the dataframes)
+           Output: Dataframe of the recording metadata, None when the files were not validated
+           On Failure: Raise Exception
+
+           Written By: Anupam Hore
+           Version: 1.0
+           Revisions: None
+        """
+        if any(clean_path not in self.recordings for clean_path in clean_paths):
+            return None
+
+        rows = []
+        offset = 0
+        for clean_path, df in zip(clean_paths, frames):
+            metadata = dict(self.recordings[clean_path])
+            metadata['columns'] = ','.join(metadata['columns'])
+            metadata['rows'] = len(df)
+            metadata['offset'] = offset
+            if metadata['rows'] != metadata['expected_rows']:
+                self.logger.log(self.file_path, "%s has %s rows, expected %s" % (metadata['path'], metadata['rows'], metadata['expected_rows']))
+            offset = offset + len(df)
+            rows.append(metadata)
+
+        return pd.DataFrame(rows, columns=['path', 'label', 'task', 'frequency', 'clock', 'duration',
+                                           'columns', 'expected_rows', 'rows', 'offset'])
+
     def cleanFiles(self,files):
         """
            Method Name: cleanFiles
@@ -61,87 +345,18 @@ class train_validation:
            On Failure: Raise ValueError,KeyError,Exception
 
            Written By: Anupam Hore
-           Version: 1.0
-           Revisions: None
+           Version: 1.1
+           Revisions: Each file is cleaned in a single streaming pass by cleanFile
         """
         self.logger.log(self.file_path, "cleanFiles Started!!!")
-        start_dir =  os.getcwd() +"\Clean_Raw_Data"
         try:
             for file in files:
-                with open(file, 'r') as f:
-                    lines = f.readlines() # Read the files
-
-                separator = "\\"
-                if platform == 'darwin': # mac system
-                    separator = "/"
-                filePathSplit = file.split(separator)
-                filename = filePathSplit.pop()
-                filedirectory = filePathSplit.pop()
-
-                directoryPath = start_dir + separator + filedirectory
-                if not os.path.isdir(directoryPath):
-                    os.makedirs(directoryPath)
-
-                file_to_write_path = directoryPath + separator + filename
+                filedirectory, file_to_write_path = self.getCleanFilePath(file)
                 self.logger.log(self.file_path, "Path Name: %s"%file_to_write_path)
-                with open(file_to_write_path, 'w') as f: # Remove the 4 rows which are common in all the files
-                    count = 1
-                    for line in lines:
-                        if count > 4:
-                            f.write(line) # re-write the entries in the existing file only after 4th row
-                        count = count + 1
-
-                #check if entries in the files are valid. Sometime, single row may also be present,
-                # instead of multiple columns. In that case we need to handle the file properly
-                firstLine = ''
-                file_needs_correction = False
-                with open(file_to_write_path,"r") as f:
-                    next(f)
-                    data = csv.reader(f)
-                    for line in enumerate(data):
-                        if len(line[1]) == 1:
-                            file_needs_correction = True
-                            break
-                if file_needs_correction:
-                    """
-                    Three steps are performed
-                    Step 1: We will collect the first row which contains the header of the dataset
-                    """
-                    with open(file_to_write_path, "r") as f:
-                        lines = f.readlines()
-                        count = 0
-                        for line in lines:
-                            if count == 0:
-                                firstLine = line
-                                break
-
-                    """
-                    Three steps are performed
-                    Step 2: We will collect all the items in the file except the first line which is the header
-                            Header we already collected in the first step
-                    """
-                    with open(file_to_write_path, "r") as f:
-                        next(f)
-                        lines1 = f.readlines()
-
-                    """
-                    Three steps are performed
-                    Step 3: We will write into the same file (newly) with the header printed first
-                            and then the other items
-                            The other items are present in the form of string. So, we will first split
-                            them and then join the items with ",". 
-                            NOTE: Splitting added one "\n" character so we have to delete it and hence the
-                            pop operation.    
-                    """
-                    with open(file_to_write_path, "w+") as f:
-                        f.write(firstLine)
-                        for line in lines1:
-                            list_ = line.split(" ")
-                            list_.pop()
-                            item = ','.join(list_)
-                            f.write(item)
-                            f.write('\n')
 
+                # read the raw file once and write the cleaned entries in the same pass
+                header = cleanFile(file, file_to_write_path)
+                self.logger.log(self.file_path, "Header of %s: %s" % (file_to_write_path, header))
 
             self.logger.log(self.file_path, "cleanFiles Completed!!!")
 
@@ -149,17 +364,100 @@ class train_validation:
             self.logger.log(self.file_path, "File cleaning Error: %s"%Exception(e))
             raise Exception(e)
 
-    def combileFiles(self):
+    def getCleanFilePath(self, file, create=True):
+        """
+           Method Name: getCleanFilePath
+           Description: This method finds out the activity directory of the raw file and the
+                        path where its cleaned copy will be written. The directory in
+                        Clean_Raw_Data is created if it is not present
+           Parameter: file(the raw csv file), create(create the directory of the clean file)
+           Output: activity directory name, path of the clean file
+           On Failure: Raise Exception
+
+           Written By: Anupam Hore
+           Version: 1.0
+           Revisions: None
+        """
+        separator = "\\"
+        if platform == 'darwin': # mac system
+            separator = "/"
+        start_dir = os.getcwd() + "\Clean_Raw_Data"
+
+        filePathSplit = file.split(separator)
+        filename = filePathSplit.pop()
+        filedirectory = filePathSplit.pop()
+
+        directoryPath = start_dir + separator + filedirectory
+        if create and not os.path.isdir(directoryPath):
+            os.makedirs(directoryPath, exist_ok=True)
+
+        return filedirectory, directoryPath + separator + filename
+
+    def cleanFilesParallel(self, files, n_workers=None, persist=True):
+        """
+           Method Name: cleanFilesParallel
+           Description: This method cleans and parses the files on a process pool. Every file
+                        is an independent task, so the activity directories (bending1, cycling,
+                        walking, ...) are processed at the same time on all the given workers.
+                        With one worker the files are processed in this process
+           Parameter: files(the raw csv files), n_workers(number of worker processes),
+                      persist(write the clean files to Clean_Raw_Data)
+           Output: Dictionary of activity directory and the list of its clean files and
+                   parsed dataframes
+           On Failure: Raise ValueError,KeyError,Exception
+
+           Written By: Anupam Hore
+           Version: 1.1
+           Revisions: Added the in memory mode
+        """
+        self.logger.log(self.file_path, "cleanFilesParallel Started!!!")
+        try:
+            directories = []
+            clean_paths = []
+            for file in files:
+                filedirectory, file_to_write_path = self.getCleanFilePath(file, create=persist)
+                directories.append(filedirectory)
+                clean_paths.append(file_to_write_path)
+
+            # without persistence the clean entries are only kept in memory
+            targets = clean_paths if persist else [None] * len(files)
+
+            frames = {}
+            if n_workers == 1:
+                results = map(cleanAndParseFile, files, targets)
+                for directory, clean_path, df in zip(directories, clean_paths, results):
+                    frames.setdefault(directory, []).append((clean_path, df))
+            else:
+                with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    # map keeps the order of the files, so the master table is built in a fixed order
+                    results = executor.map(cleanAndParseFile, files, targets)
+                    for directory, clean_path, df in zip(directories, clean_paths, results):
+                        self.logger.log(self.file_path, "Path Name: %s" % clean_path)
+                        frames.setdefault(directory, []).append((clean_path, df))
+
+            self.logger.log(self.file_path, "cleanFilesParallel Completed!!!")
+            return frames
+
+        except Exception as e:
+            self.logger.log(self.file_path, "Parallel File cleaning Error: %s"%Exception(e))
+            raise Exception(e)
+
+    def combileFiles(self, frames=None, persist=True):
         """
            Method Name: combileFiles
            Description: This method will combile all the files of each directory
                         and will assign the labels(target variable)
-           Output: None
+           Parameter: frames(Dictionary of activity directory and its clean files and parsed
+                      dataframes. When it is not given the files are read again from Clean_Raw_Data),
+                      persist(save the master dataframe to the training store)
+           Output: The master dataframe
            On Failure: Raise ValueError,KeyError,Exception
 
            Written By: Anupam Hore
-           Version: 1.0
-           Revisions: None
+           Version: 1.3
+           Revisions: Accepts the dataframes already parsed by the parallel ingestion. Saves the
+                      recording metadata of the validated files with the training data. Returns
+                      the master dataframe
         """
         self.logger.log(self.file_path, "combileFiles Started!!!")
         try:
@@ -167,48 +465,302 @@ class train_validation:
             if platform == 'darwin':  # mac system
                 separator = "/"
             start_dir = os.getcwd() + "\Clean_Raw_Data"
-            files = [f for f in listdir(start_dir)]
+            if frames is None:
+                files = [f for f in listdir(start_dir)]
+            else:
+                files = list(frames.keys())
 
-            #create an empty master dataframe which will have all the combined csv files from all
-            #the directories and then finally we will convert it to master csv file and that file
+            #collect the dataframes of all the files from all the directories with their labels.
+            #The master dataframe is built from them in a single allocation by mergeFrames and
             #will be used for training
 
-            master_df = pd.DataFrame() # Empty dataset
+            all_frames = []
+            labels = []
+            clean_paths = []
             for directory in files:
-                files_ = [f for f in listdir(start_dir + separator + directory)]
+                if frames is None:
+                    files_ = [f for f in listdir(start_dir + separator + directory)]
+                else:
+                    files_ = frames[directory]
                 self.logger.log(self.file_path, "Total Files: %s" % len(files_))
 
-                df = pd.DataFrame() #empty dataframe for sub directories
                 for file in files_:
-
-                    csv_path = start_dir + separator + directory + separator + file
-                    self.logger.log(self.file_path, "File Path: %s" % csv_path)
-                    tmp_df = pd.read_csv(csv_path, error_bad_lines=False)
-                    df = pd.concat([df, tmp_df], ignore_index=True)
-                df['Label'] = str(directory)
-                master_df = pd.concat([master_df, df], ignore_index=True)
+                    if frames is None:
+                        csv_path = start_dir + separator + directory + separator + file
+                        if len(self.recordings) > 0 and csv_path not in self.recordings:
+                            # clean file of a rejected or removed raw file
+                            self.logger.log(self.file_path, "Skipped File: %s" % csv_path)
+                            continue
+                        self.logger.log(self.file_path, "File Path: %s" % csv_path)
+                        tmp_df = pd.read_csv(csv_path, on_bad_lines='skip', dtype=np.float64)
+                    else:
+                        csv_path, tmp_df = file
+                    all_frames.append(tmp_df)
+                    labels.append(str(directory))
+                    clean_paths.append(csv_path)
+
+            master_df = self.mergeFrames(all_frames, labels)
+            self.recordingsTable = self.buildRecordingsTable(clean_paths, all_frames)
             self.logger.log(self.file_path, "Master DataFrame Created!!!")
 
-            training_csv_dir = os.getcwd() + "\Training_Data"
-            if not os.path.isdir(training_csv_dir):
-                os.makedirs(training_csv_dir)
-
-            finalfileName = 'Input.csv'
-            finalPath = training_csv_dir + separator + finalfileName
-            master_df.to_csv(finalPath)
+            if persist:
+                self.saveMasterFile(master_df, self.recordingsTable)
 
             self.logger.log(self.file_path, "combileFiles Completed!!!")
+            return master_df
 
         except Exception as e:
             self.logger.log(self.file_path, "File Combine Error: %s"%Exception(e))
             raise Exception(e)
 
+    def mergeFrames(self, frames, labels, labelName='Label'):
+        """
+           Method Name: mergeFrames
+           Description: This method builds the master dataframe from the dataframes of the files.
+                        The row counts are known up front, so the feature block is allocated once
+                        and every file is copied into its own slice, instead of growing the master
+                        dataframe with pd.concat for every file. The label is attached as a
+                        categorical code per row and not as a python string
+           Parameter: frames(list of dataframes of the files), labels(label of each dataframe),
+                      labelName(the target variable name)
+           Output: The master dataframe
+           On Failure: Raise Exception
+
+           Written By: Anupam Hore
+           Version: 1.0
+           Revisions: None
+        """
+        columns = [col for col in frames[0].columns if col != labelName]
+        categories = list(dict.fromkeys(labels))
+        total_rows = sum(len(df) for df in frames)
+
+        block = np.empty((total_rows, len(columns)), dtype=np.float64)
+        codes = np.empty(total_rows, dtype=np.int8 if len(categories) < 128 else np.int16)
+
+        offset = 0
+        for df, label in zip(frames, labels):
+            rows = len(df)
+            if list(df.columns) != columns:
+                df = df.reindex(columns=columns)
+            block[offset:offset + rows] = df.to_numpy(dtype=np.float64)
+            codes[offset:offset + rows] = categories.index(label)
+            offset = offset + rows
+
+        master_df = pd.DataFrame(block, columns=columns, copy=False)
+        master_df[labelName] = pd.Categorical.from_codes(codes, categories=categories)
+        return master_df
+
+    def getTrainingDataPath(self, filename):
+        """
+           Method Name: getTrainingDataPath
+           Description: This method gives the path of the file in the Training_Data directory,
+                        the directory of the training store. The directory is created if it is
+                        not present
+           Parameter: filename(name of the file)
+           Output: path of the file
+           On Failure: Raise Exception
+
+           Written By: Anupam Hore
+           Version: 1.1
+           Revisions: The path is joined with os.path.join, like the path of the training store
+        """
+        training_csv_dir = os.path.join(os.getcwd(), 'Training_Data')
+        if not os.path.isdir(training_csv_dir):
+            os.makedirs(training_csv_dir)
+        return os.path.join(training_csv_dir, filename)
+
+    def saveMasterFile(self, master_df, recordings=None):
+        """
+           Method Name: saveMasterFile
+           Description: This method saves the master dataframe to the columnar training store
+                        which will be used for model training. The master csv file is only
+                        written when the csv export is requested
+           Parameter: master_df(the combined dataframe), recordings(recording metadata table)
+           Output: None
+           On Failure: Raise Exception
+
+           Written By: Anupam Hore
+           Version: 1.0
+           Revisions: None
+        """
+        Training_Store(self.file_path, self.logger).save(master_df, 'Label', recordings)
+        if self.export_csv:
+            finalPath = self.getTrainingDataPath('Input.csv')
+            master_df.to_csv(finalPath)
+            self.logger.log(self.file_path, "Master File Saved: %s" % finalPath)
+
+    def loadManifest(self):
+        """
+           Method Name: loadManifest
+           Description: This method loads the manifest of the last incremental run. The manifest
+                        has one entry for each raw file in the order of its rows in the master
+                        file: path, size, mtime, content hash, cleaned file, label and rows
+           Output: list of manifest entries (empty when there is no manifest or training store)
+           On Failure: Raise Exception
 
+           Written By: Anupam Hore
+           Version: 1.0
+           Revisions: None
+        """
+        manifestPath = self.getTrainingDataPath('manifest.json')
+        if not os.path.isfile(manifestPath) or not Training_Store(self.file_path, self.logger).exists():
+            return []
+        with open(manifestPath, 'r') as f:
+            return json.load(f)['files']
 
+    def saveManifest(self, entries):
+        """
+           Method Name: saveManifest
+           Description: This method saves the manifest entries of the incremental run
+           Parameter: entries(list of manifest entries)
+           Output: None
+           On Failure: Raise Exception
 
+           Written By: Anupam Hore
+           Version: 1.0
+           Revisions: None
+        """
+        with open(self.getTrainingDataPath('manifest.json'), 'w') as f:
+            json.dump({'files': entries}, f, indent=1)
 
+    def removeManifest(self):
+        """
+           Method Name: removeManifest
+           Description: This method removes the manifest when the master file is rebuilt from
+                        scratch, so that the next incremental run does not patch a master file
+                        the manifest does not describe
+           Output: None
+           On Failure: Raise Exception
 
+           Written By: Anupam Hore
+           Version: 1.0
+           Revisions: None
+        """
+        manifestPath = self.getTrainingDataPath('manifest.json')
+        if os.path.isfile(manifestPath):
+            os.remove(manifestPath)
 
+    def incrementalValidation(self, files, parallel=False, n_workers=None, persist=True):
+        """
+           Method Name: incrementalValidation
+           Description: This method compares the raw files with the manifest of the last run and
+                        only cleans the files which were added or changed. A file is unchanged if
+                        its size and mtime are the same, or if its content hash is the same.
+                        The rows of the deleted and changed files are dropped from the training
+                        store and the rows of the new and changed files are appended to it.
+                        When there is no manifest all the files are processed.
+           Parameter: files(the raw csv files), parallel(clean and parse the files on a process
+                      pool), n_workers(number of worker processes), persist(save the clean files,
+                      the patched training store and the manifest)
+           Output: The master dataframe
+           On Failure: Raise ValueError,KeyError,Exception
 
+           Written By: Anupam Hore
+           Version: 1.2
+           Revisions: Returns the master dataframe. Added the in memory mode. The master dataframe
+                      is float64 when it is up to date too
+        """
+        self.logger.log(self.file_path, "incrementalValidation Started!!!")
+        try:
+            entries = self.loadManifest()
+            previous = {entry['path']: entry for entry in entries}
 
+            current = {}
+            changed = []
+            for file in files:
+                path = os.path.relpath(file)
+                stat = os.stat(file)
+                entry = previous.get(path)
+                if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                    current[path] = entry
+                    continue
+
+                fileHash = hashFile(file)
+                if entry is not None and entry['hash'] == fileHash:
+                    # the file was touched but the content is the same
+                    entry['size'] = stat.st_size
+                    entry['mtime'] = stat.st_mtime
+                    current[path] = entry
+                    continue
+
+                current[path] = {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': fileHash}
+                changed.append(file)
+
+            deleted = [entry for entry in entries if entry['path'] not in current]
+            self.logger.log(self.file_path, "Changed Files: %s" % changed)
+            self.logger.log(self.file_path, "Deleted Files: %s" % [entry['path'] for entry in deleted])
+
+            if len(changed) == 0 and len(deleted) == 0:
+                store = Training_Store(self.file_path, self.logger)
+                if persist:
+                    self.saveManifest(entries)
+                self.recordingsTable = store.load_recordings()
+                self.logger.log(self.file_path, "Master File is up to date!!!")
+                # float64 like the master dataframe of the other paths
+                return store.load_dataframe(mmap_mode=None, dtype=np.float64)
+
+            if persist:
+                for entry in deleted:
+                    if os.path.isfile(entry['clean_path']):
+                        os.remove(entry['clean_path'])
+
+            # keep the rows of the files which are not changed, the manifest entries are in the
+            # order of the rows in the training store
+            kept = []
+            frames = []
+            labels = []
+            clean_paths = []
+            if len(entries) > 0:
+                # read into memory, the store files are replaced at the end of the run
+                features, _, columns, _ = Training_Store(self.file_path, self.logger).load_arrays(mmap_mode=None)
+                offset = 0
+                for entry in entries:
+                    if entry['path'] in current and current[entry['path']] is entry:
+                        kept.append(entry)
+                        frames.append(pd.DataFrame(features[offset:offset + entry['rows']], columns=columns))
+                        labels.append(entry['label'])
+                        clean_paths.append(entry['clean_path'])
+                    offset = offset + entry['rows']
+
+            # clean and parse the new and the changed files
+            directories = []
+            changed_clean_paths = []
+            for file in changed:
+                filedirectory, file_to_write_path = self.getCleanFilePath(file, create=persist)
+                directories.append(filedirectory)
+                changed_clean_paths.append(file_to_write_path)
+
+            # without persistence the clean entries are only kept in memory
+            targets = changed_clean_paths if persist else [None] * len(changed)
+            if parallel:
+                with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    new_frames = list(executor.map(cleanAndParseFile, changed, targets))
+            else:
+                new_frames = [cleanAndParseFile(file, target) for file, target in zip(changed, targets)]
+
+            for file, directory, clean_path, df in zip(changed, directories, changed_clean_paths, new_frames):
+                self.logger.log(self.file_path, "Path Name: %s" % clean_path)
+                frames.append(df)
+                labels.append(str(directory))
+                clean_paths.append(clean_path)
+
+                entry = current[os.path.relpath(file)]
+                entry['clean_path'] = clean_path
+                entry['label'] = str(directory)
+                entry['rows'] = len(df)
+                kept.append(entry)
+
+            master_df = self.mergeFrames(frames, labels)
+            self.recordingsTable = self.buildRecordingsTable(clean_paths, frames)
+            self.logger.log(self.file_path, "Master DataFrame Patched!!!")
+
+            if persist:
+                self.saveMasterFile(master_df, self.recordingsTable)
+                self.saveManifest(kept)
+
+            self.logger.log(self.file_path, "incrementalValidation Completed!!!")
+            return master_df
 
+        except Exception as e:
+            self.logger.log(self.file_path, "Incremental Validation Error: %s"%Exception(e))
+            raise Exception(e)
@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from app_logging.logger import appLogger
+
+class TrainingJobQueue:
+    """
+        This class shall be used to run the training pipeline as background jobs, so that the
+        web request only puts the job in the queue and returns the job id.
+
+        Every job keeps its status (queued, running, succeeded, failed), the current stage,
+        the timings of the stages and the result of the pipeline. A job which is submitted
+        with the same parameters as a job still waiting in the queue is not queued again,
+        the id of the waiting job is returned instead.
+
+        By default one worker runs the jobs, because the pipelines write the same log, store
+        and model files and must not run at the same time.
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+    """
+    def __init__(self, max_workers=1, max_history=100):
+        self.logger = appLogger()
+        self.file_object = open("Training_Logs/TrainingJobs.txt", 'a+')
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.pending = {}
+        self.finished = []
+        self.max_history = max_history
+
+    def submit(self, params, function):
+        """
+        Method Name: submit
+        Description: This function puts a job in the queue. When a job with the same parameters
+                     is still waiting in the queue, that job is returned instead
+        Parameter: params(Dictionary of the job parameters),
+                   function(the pipeline, called as function(params, progress) and returning a
+                   dictionary with the result of the job)
+        Output: id of the job
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        key = json.dumps(params, sort_keys=True)
+        with self.lock:
+            if key in self.pending:
+                job_id = self.pending[key]
+                self.logger.log(self.file_object, "Job %s already pending for %s" % (job_id, key))
+                return job_id
+
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {'job_id': job_id,
+                                 'params': params,
+                                 'status': 'queued',
+                                 'stage': None,
+                                 'stages': [],
+                                 'submitted': time.time(),
+                                 'started': None,
+                                 'finished': None,
+                                 'result': None,
+                                 'error': None}
+            self.pending[key] = job_id
+
+        self.logger.log(self.file_object, "Job %s queued for %s" % (job_id, key))
+        self.executor.submit(self.runJob, job_id, key, function)
+        return job_id
+
+    def runJob(self, job_id, key, function):
+        """
+        Method Name: runJob
+        Description: This function runs the job on the worker thread and records its status,
+                     stage timings and result
+        Parameter: job_id(id of the job), key(the parameters key of the job), function(the pipeline)
+        Output: None
+        On Failure: The error is saved in the job
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        with self.lock:
+            # from now on the same parameters start a new job
+            self.pending.pop(key, None)
+            job = self.jobs[job_id]
+            job['status'] = 'running'
+            job['started'] = time.time()
+
+        self.logger.log(self.file_object, "Job %s Started!!!" % job_id)
+        try:
+            result = function(job['params'], lambda stage: self.setStage(job_id, stage))
+            with self.lock:
+                self.closeStage(job)
+                job['status'] = 'succeeded'
+                job['result'] = result
+            self.logger.log(self.file_object, "Job %s Completed!!!" % job_id)
+
+        except Exception as e:
+            with self.lock:
+                self.closeStage(job)
+                job['status'] = 'failed'
+                job['error'] = str(e)
+            self.logger.log(self.file_object, "Job %s Error: %s" % (job_id, Exception(e)))
+
+        finally:
+            with self.lock:
+                job['finished'] = time.time()
+                self.finished.append(job_id)
+                while len(self.finished) > self.max_history:
+                    self.jobs.pop(self.finished.pop(0), None)
+
+    def setStage(self, job_id, stage):
+        """
+        Method Name: setStage
+        Description: This function is the progress callback of the pipeline. It closes the
+                     timing of the current stage and starts the given stage
+        Parameter: job_id(id of the job), stage(name of the stage)
+        Output: None
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        with self.lock:
+            job = self.jobs[job_id]
+            self.closeStage(job)
+            job['stage'] = stage
+            job['stages'].append({'stage': stage, 'started': time.time(), 'seconds': None})
+        self.logger.log(self.file_object, "Job %s Stage: %s" % (job_id, stage))
+
+    def closeStage(self, job):
+        """
+        Method Name: closeStage
+        Description: This function records the duration of the current stage of the job
+        Parameter: job(the job)
+        Output: None
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        if len(job['stages']) > 0 and job['stages'][-1]['seconds'] is None:
+            job['stages'][-1]['seconds'] = time.time() - job['stages'][-1]['started']
+
+    def status(self, job_id):
+        """
+        Method Name: status
+        Description: This function gives the status of the job
+        Parameter: job_id(id of the job)
+        Output: Dictionary of the job status, None when the job is not known
+        On Failure: Exception
+
+        Written By: Anupam Hore
+        Version: 1.0
+        Revisions: None
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            status = dict(job)
+            status['stages'] = [dict(stage) for stage in job['stages']]
+
+        end = status['finished'] or time.time()
+        status['queued_seconds'] = (status['started'] or end) - status['submitted']
+        status['running_seconds'] = end - status['started'] if status['started'] else None
+        return status